@@ -2,15 +2,37 @@ from __future__ import annotations
 
 from fastapi import APIRouter, Depends
 
-from app.api.deps import get_current_user, get_llm
+from app.api.deps import get_current_user, get_llm, require_admin
+from app.api.sse import sse_response, token_events
 from app.schemas.qa import SummaryRequest
-from app.services.summarizer import generate_summary
+from app.services.llm_cache import get_llm_cache
+from app.services.llm_guard import get_llm_guard
+from app.services.llm_scheduler import llm_work
+from app.services.summarizer import generate_summary, stream_summary
 
 router = APIRouter(tags=["ai"])
 
 
 @router.post("/generate-summary")
-async def generate_summary_endpoint(payload: SummaryRequest, _: str = Depends(get_current_user)) -> dict[str, str]:
+async def generate_summary_endpoint(payload: SummaryRequest, user=Depends(get_current_user)) -> dict[str, str]:
     llm = await get_llm()
-    summary = await generate_summary(payload.content, llm)
+    with llm_work("interactive", user.id):
+        summary = await generate_summary(payload.content, llm)
     return {"summary": summary}
+
+
+@router.post("/generate-summary/stream")
+async def stream_summary_endpoint(payload: SummaryRequest, user=Depends(get_current_user)):
+    llm = await get_llm()
+
+    async def events():
+        with llm_work("interactive", user.id):
+            async for event in token_events(stream_summary(payload.content, llm)):
+                yield event
+
+    return sse_response(events())
+
+
+@router.get("/llm/metrics")
+async def llm_metrics(_: str = Depends(require_admin)) -> dict[str, dict]:
+    return {"cache": get_llm_cache().stats(), **get_llm_guard().stats()}
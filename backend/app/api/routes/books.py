@@ -1,69 +1,95 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, BackgroundTasks, Depends, File, Form, HTTPException, Request, UploadFile, status
+from typing import Literal
+
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Request, Response, UploadFile, status
 from sqlalchemy import delete, func, select, desc
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_current_user, get_db, get_llm, get_storage
+from app.api.deps import get_current_user, get_db, get_storage
 from app.models.borrow import BookBorrow
 from app.models.book import Book
+from app.models.book_processing_job import BookProcessingJob
 from app.models.review import Review
-from app.schemas.book import BookListResponse, BookRead, BookSummaryRead, BookUpdate
+from app.schemas.book import BookListResponse, BookProcessingRead, BookRead, BookSummaryRead, BookUpdate
 from app.schemas.borrow import BorrowRead, BorrowStatusRead
 from app.schemas.review import ReviewRead
-from app.db.session import SessionLocal
-from app.services.summarizer import generate_summary
-from app.services.text_extraction import extract_text
+from app.services.book_pipeline import get_book_pipeline, queue_stage
+from app.services.file_store import acquire_stored_file, find_extracted_text, release_stored_file
+from app.services.text_extraction import content_type_for, extract_file_text_async
+from app.services.uploads import SpooledUpload, spool_upload
 
 router = APIRouter(prefix="/books", tags=["books"])
 
 
-async def _update_book_summary(book_id: int, content: str) -> None:
-    llm = await get_llm()
-    summary = await generate_summary(content, llm)
-    async with SessionLocal() as session:
-        result = await session.execute(select(Book).where(Book.id == book_id))
-        book = result.scalar_one_or_none()
-        if book:
-            book.summary = summary
-            await session.commit()
+async def _extract_upload_text(session: AsyncSession, upload: SpooledUpload) -> tuple[str, str]:
+    cached = await find_extracted_text(session, upload.sha256)
+    if cached is not None:
+        return cached, content_type_for(upload.filename)
+    return await extract_file_text_async(upload.filename, upload.path)
+
+
+async def _attach_upload(
+    session: AsyncSession,
+    storage,
+    book: Book,
+    upload: SpooledUpload,
+    mode: str,
+) -> str | None:
+    # Returns the first pipeline stage still to run. The stored-file reference is taken in the
+    # request session, so it commits or rolls back together with the book.
+    extracted_text, content_type = None, content_type_for(upload.filename)
+    if mode == "sync":
+        extracted_text, content_type = await _extract_upload_text(session, upload)
+    storage_key = await acquire_stored_file(session, storage, upload)
+
+    book.file_key = storage_key
+    book.file_name = upload.filename
+    book.content_type = content_type
+    book.file_size = upload.size
+    book.file_hash = upload.sha256
+    book.content_text = extracted_text
+    if mode == "async":
+        return "extract"
+    return "summarize" if extracted_text else None
+
+
+def _queue_processing(session: AsyncSession, book: Book, stage: str | None) -> None:
+    if stage is None:
+        book.processing_status = "ready"
+        book.processing_error = None
+        return
+    session.add(queue_stage(book, stage))
 
 
 @router.post("", response_model=BookRead, status_code=status.HTTP_201_CREATED)
 async def create_book(
-    background_tasks: BackgroundTasks,
+    response: Response,
     file: UploadFile = File(...),
     title: str = Form(...),
     author: str = Form(...),
     genre: str = Form(...),
     year_published: int = Form(...),
+    mode: Literal["sync", "async"] = "sync",
     session: AsyncSession = Depends(get_db),
     _: str = Depends(get_current_user),
     storage=Depends(get_storage),
 ) -> Book:
-    content_bytes = await file.read()
-    extracted_text, content_type = extract_text(file.filename, content_bytes)
-    storage_key = await storage.save(file.filename, content_bytes)
-
-    book = Book(
-        title=title,
-        author=author,
-        genre=genre,
-        year_published=year_published,
-        file_key=storage_key,
-        file_name=file.filename,
-        content_type=content_type,
-        file_size=len(content_bytes),
-        content_text=extracted_text,
-    )
+    book = Book(title=title, author=author, genre=genre, year_published=year_published)
+    async with spool_upload(file) as upload:
+        stage = await _attach_upload(session, storage, book, upload, mode)
+
     session.add(book)
+    await session.flush()
+    _queue_processing(session, book, stage)
     await session.commit()
     await session.refresh(book)
 
-    if extracted_text:
-        background_tasks.add_task(_update_book_summary, book.id, extracted_text)
-
+    if stage is not None:
+        get_book_pipeline().notify()
+    if mode == "async":
+        response.status_code = status.HTTP_202_ACCEPTED
     return book
 
 
@@ -95,12 +121,13 @@ async def get_book(book_id: int, session: AsyncSession = Depends(get_db)) -> Boo
 async def update_book(
     book_id: int,
     request: Request,
-    background_tasks: BackgroundTasks,
+    response: Response,
     file: UploadFile | None = File(default=None),
     title: str | None = Form(default=None),
     author: str | None = Form(default=None),
     genre: str | None = Form(default=None),
     year_published: int | None = Form(default=None),
+    mode: Literal["sync", "async"] = "sync",
     session: AsyncSession = Depends(get_db),
     _: str = Depends(get_current_user),
     storage=Depends(get_storage),
@@ -122,25 +149,25 @@ async def update_book(
         }
         updates = {key: value for key, value in updates.items() if value is not None}
 
+    stage = None
+    if file is not None:
+        old_key = book.file_key
+        async with spool_upload(file) as upload:
+            stage = await _attach_upload(session, storage, book, upload, mode)
+        _queue_processing(session, book, stage)
+
     for field, value in updates.items():
         setattr(book, field, value)
 
-    if file is not None:
-        content_bytes = await file.read()
-        extracted_text, content_type = extract_text(file.filename, content_bytes)
-        storage_key = await storage.save(file.filename, content_bytes)
-        if book.file_key:
-            await storage.delete(book.file_key)
-        book.file_key = storage_key
-        book.file_name = file.filename
-        book.content_type = content_type
-        book.file_size = len(content_bytes)
-        book.content_text = extracted_text
-        if extracted_text:
-            background_tasks.add_task(_update_book_summary, book.id, extracted_text)
-
     await session.commit()
     await session.refresh(book)
+    if file is not None and old_key:
+        await release_stored_file(storage, old_key)
+
+    if stage is not None:
+        get_book_pipeline().notify()
+    if file is not None and mode == "async":
+        response.status_code = status.HTTP_202_ACCEPTED
     return book
 
 
@@ -155,12 +182,14 @@ async def delete_book(
     book = result.scalar_one_or_none()
     if not book:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Book not found")
-    if book.file_key:
-        await storage.delete(book.file_key)
+    file_key = book.file_key
     await session.execute(delete(Review).where(Review.book_id == book_id))
     await session.execute(delete(BookBorrow).where(BookBorrow.book_id == book_id))
+    await session.execute(delete(BookProcessingJob).where(BookProcessingJob.book_id == book_id))
     await session.delete(book)
     await session.commit()
+    if file_key:
+        await release_stored_file(storage, file_key)
 
 
 @router.get("/{book_id}/reviews", response_model=list[ReviewRead])
@@ -189,6 +218,23 @@ async def get_book_summary(book_id: int, session: AsyncSession = Depends(get_db)
     )
 
 
+@router.get("/{book_id}/processing", response_model=BookProcessingRead)
+async def get_book_processing(book_id: int, session: AsyncSession = Depends(get_db)) -> BookProcessingRead:
+    result = await session.execute(select(Book).where(Book.id == book_id))
+    book = result.scalar_one_or_none()
+    if not book:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Book not found")
+    job_result = await session.execute(
+        select(BookProcessingJob).where(BookProcessingJob.book_id == book_id).order_by(BookProcessingJob.id)
+    )
+    return BookProcessingRead(
+        book_id=book.id,
+        processing_status=book.processing_status,
+        processing_error=book.processing_error,
+        stages=list(job_result.scalars().all()),
+    )
+
+
 @router.get("/{book_id}/analysis", response_model=BookSummaryRead)
 async def get_book_analysis(book_id: int, session: AsyncSession = Depends(get_db)) -> BookSummaryRead:
     return await get_book_summary(book_id, session)
@@ -276,13 +322,15 @@ async def delete_book_file(
     book = result.scalar_one_or_none()
     if not book:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Book not found")
-    if book.file_key:
-        await storage.delete(book.file_key)
+    file_key = book.file_key
     book.file_key = None
     book.file_name = None
     book.content_type = None
     book.file_size = None
+    book.file_hash = None
     book.content_text = None
     await session.commit()
     await session.refresh(book)
+    if file_key:
+        await release_stored_file(storage, file_key)
     return book
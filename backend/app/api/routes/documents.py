@@ -8,6 +8,9 @@ from app.api.deps import get_current_user, get_db
 from app.models.document import Document
 from app.models.user import User
 from app.schemas.document import DocumentCreate, DocumentRead
+from app.services.file_store import find_extracted_text
+from app.services.text_extraction import extract_file_text_async
+from app.services.uploads import spool_upload
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 
@@ -33,8 +36,11 @@ async def upload_document(
 ) -> Document:
     if not file.filename:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Missing filename")
-    content = (await file.read()).decode("utf-8", errors="ignore")
-    document = Document(filename=file.filename, content=content, owner_id=user.id)
+    async with spool_upload(file) as upload:
+        content = await find_extracted_text(session, upload.sha256)
+        if content is None:
+            content, _ = await extract_file_text_async(upload.filename, upload.path)
+    document = Document(filename=file.filename, content=content, owner_id=user.id, file_hash=upload.sha256)
     session.add(document)
     await session.commit()
     await session.refresh(document)
@@ -1,60 +1,166 @@
 from __future__ import annotations
 
-import asyncio
 import logging
+from datetime import datetime, timezone
+from typing import Literal
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+from sqlalchemy import exists, func, insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_current_user, get_db
-from app.db.session import SessionLocal
+from app.core.config import settings
 from app.models.document import Document
 from app.models.document_chunk import DocumentChunk
+from app.models.ingestion_batch import IngestionBatch
 from app.models.ingestion_job import IngestionJob
 from app.models.user import User
-from app.schemas.ingestion import IngestionJobRead
-from app.services.ingestion import build_embeddings
+from app.schemas.ingestion import IngestionBatchCreate, IngestionBatchRead, IngestionJobRead
+from app.services.ingestion_queue import get_ingestion_scheduler
+from app.services.job_queue import as_utc
 
 router = APIRouter(prefix="/ingestion", tags=["ingestion"])
 logger = logging.getLogger("smart_qa.ingestion")
 
+ID_LOOKUP_BATCH = 1000
+
+
+async def _batch_document_ids(session: AsyncSession, payload: IngestionBatchCreate, owner_id: int) -> list[int]:
+    if payload.all_uningested:
+        # Documents with no chunks and no job that is queued, running or already done.
+        has_chunks = exists().where(DocumentChunk.document_id == Document.id)
+        has_job = exists().where(
+            IngestionJob.document_id == Document.id,
+            IngestionJob.status.in_(("pending", "running", "completed")),
+        )
+        result = await session.execute(
+            select(Document.id).where(Document.owner_id == owner_id, ~has_chunks, ~has_job).order_by(Document.id)
+        )
+        return list(result.scalars().all())
+
+    requested = list(dict.fromkeys(payload.document_ids))
+    found: set[int] = set()
+    for start in range(0, len(requested), ID_LOOKUP_BATCH):
+        result = await session.execute(
+            select(Document.id).where(
+                Document.id.in_(requested[start : start + ID_LOOKUP_BATCH]), Document.owner_id == owner_id
+            )
+        )
+        found.update(result.scalars().all())
+    missing = [document_id for document_id in requested if document_id not in found]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Documents not found: {', '.join(map(str, missing[:20]))}",
+        )
+    return requested
+
+
+async def _batch_status(session: AsyncSession, batch: IngestionBatch) -> IngestionBatchRead:
+    result = await session.execute(
+        select(
+            IngestionJob.status,
+            func.count(),
+            func.coalesce(func.sum(IngestionJob.chunks_processed), 0),
+            func.max(IngestionJob.updated_at),
+        )
+        .where(IngestionJob.batch_id == batch.id)
+        .group_by(IngestionJob.status)
+    )
+    counts = {"pending": 0, "running": 0, "completed": 0, "failed": 0}
+    chunks_processed = 0
+    last_update = None
+    for job_status, count, chunks, updated_at in result.all():
+        counts[job_status] = counts.get(job_status, 0) + count
+        chunks_processed += chunks
+        if updated_at is not None and (last_update is None or as_utc(updated_at) > last_update):
+            last_update = as_utc(updated_at)
+
+    finished = counts["completed"] + counts["failed"]
+    done = finished >= batch.total_jobs
+    finished_at = last_update if done and last_update else None
+    created_at = as_utc(batch.created_at)
+    elapsed = max(((finished_at or datetime.now(timezone.utc)) - created_at).total_seconds(), 0.0)
+    if not done:
+        batch_status = "running" if finished or counts["running"] else "pending"
+    else:
+        batch_status = "completed" if not counts["failed"] else "completed_with_errors"
+    return IngestionBatchRead(
+        id=batch.id,
+        status=batch_status,
+        mode=batch.mode,
+        max_parallel=batch.max_parallel,
+        total_jobs=batch.total_jobs,
+        pending=counts["pending"],
+        running=counts["running"],
+        completed=counts["completed"],
+        failed=counts["failed"],
+        chunks_processed=chunks_processed,
+        elapsed_seconds=elapsed,
+        documents_per_second=finished / elapsed if elapsed else 0.0,
+        chunks_per_second=chunks_processed / elapsed if elapsed else 0.0,
+        created_at=created_at,
+        finished_at=finished_at,
+    )
 
-async def _process_ingestion(job_id: int, document_id: int) -> None:
-    async with SessionLocal() as session:
-        result = await session.execute(select(IngestionJob).where(IngestionJob.id == job_id))
-        job = result.scalar_one_or_none()
-        if not job:
-            return
 
-        job.status = "running"
-        await session.commit()
+@router.post("/batch", response_model=IngestionBatchRead, status_code=status.HTTP_202_ACCEPTED)
+async def start_batch_ingestion(
+    payload: IngestionBatchCreate,
+    session: AsyncSession = Depends(get_db),
+    user: User = Depends(get_current_user),
+) -> IngestionBatchRead:
+    if (payload.document_ids is None) == (not payload.all_uningested):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide either document_ids or all_uningested",
+        )
+    document_ids = await _batch_document_ids(session, payload, user.id)
+    if not document_ids:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No documents to ingest")
+
+    batch = IngestionBatch(
+        owner_id=user.id,
+        mode=payload.mode,
+        max_parallel=min(payload.max_parallel or settings.ingestion_batch_max_parallel, settings.ingestion_batch_max_parallel),
+        total_jobs=len(document_ids),
+    )
+    session.add(batch)
+    await session.flush()
+    for start in range(0, len(document_ids), ID_LOOKUP_BATCH):
+        await session.execute(
+            insert(IngestionJob),
+            [
+                {"document_id": document_id, "batch_id": batch.id, "status": "pending", "mode": payload.mode}
+                for document_id in document_ids[start : start + ID_LOOKUP_BATCH]
+            ],
+        )
+    await session.commit()
+    await session.refresh(batch)
 
-        try:
-            doc_result = await session.execute(select(Document).where(Document.id == document_id))
-            document = doc_result.scalar_one_or_none()
-            if not document:
-                job.status = "failed"
-                job.error = "Document not found"
-                await session.commit()
-                return
+    get_ingestion_scheduler().notify()
+    return await _batch_status(session, batch)
 
-            embeddings = build_embeddings(document.content)
-            for chunk, embedding in embeddings:
-                session.add(DocumentChunk(document_id=document_id, content=chunk, embedding=embedding))
 
-            job.status = "completed"
-            await session.commit()
-        except Exception as exc:  # noqa: BLE001
-            logger.exception("Ingestion failed: %s", exc)
-            job.status = "failed"
-            job.error = str(exc)
-            await session.commit()
+@router.get("/batches/{batch_id}", response_model=IngestionBatchRead)
+async def get_batch(
+    batch_id: int,
+    session: AsyncSession = Depends(get_db),
+    user: User = Depends(get_current_user),
+) -> IngestionBatchRead:
+    result = await session.execute(
+        select(IngestionBatch).where(IngestionBatch.id == batch_id, IngestionBatch.owner_id == user.id)
+    )
+    batch = result.scalar_one_or_none()
+    if not batch:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Batch not found")
+    return await _batch_status(session, batch)
 
 
 @router.post("/{document_id}", response_model=IngestionJobRead, status_code=status.HTTP_202_ACCEPTED)
 async def start_ingestion(
     document_id: int,
+    mode: Literal["incremental", "full"] = "incremental",
     session: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user),
 ) -> IngestionJob:
@@ -64,18 +170,25 @@ async def start_ingestion(
     if not result.scalar_one_or_none():
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
 
-    job = IngestionJob(document_id=document_id, status="pending")
+    job = IngestionJob(document_id=document_id, status="pending", mode=mode)
     session.add(job)
     await session.commit()
     await session.refresh(job)
 
-    asyncio.create_task(_process_ingestion(job.id, document_id))
+    get_ingestion_scheduler().notify()
     return job
 
 
 @router.get("/jobs", response_model=list[IngestionJobRead])
-async def list_jobs(session: AsyncSession = Depends(get_db), _: User = Depends(get_current_user)) -> list[IngestionJob]:
-    result = await session.execute(select(IngestionJob))
+async def list_jobs(
+    batch_id: int | None = None,
+    session: AsyncSession = Depends(get_db),
+    _: User = Depends(get_current_user),
+) -> list[IngestionJob]:
+    statement = select(IngestionJob)
+    if batch_id is not None:
+        statement = statement.where(IngestionJob.batch_id == batch_id)
+    result = await session.execute(statement)
     return list(result.scalars().all())
 
 
@@ -2,59 +2,58 @@ from __future__ import annotations
 
 import logging
 
-import httpx
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_current_user, get_db
-from app.core.config import settings
-from app.models.document_chunk import DocumentChunk
+from app.api.deps import get_current_user, get_db, get_llm
+from app.api.sse import sse_event, sse_response, token_events
+from app.models.user import User
 from app.schemas.qa import AnswerResponse, QuestionRequest
-from app.services.rag import select_relevant_chunks
+from app.services.llm_scheduler import llm_work
+from app.services.rag import pack_context, retrieve_chunks
 
 router = APIRouter(prefix="/qa", tags=["qa"])
 logger = logging.getLogger("smart_qa.qa")
 
 
-async def _generate_answer(question: str, context: str) -> str:
-    if not settings.openrouter_api_key:
-        return f"Based on the provided documents: {context[:400]}"
-
-    payload = {
-        "model": settings.openrouter_model,
-        "messages": [
-            {"role": "system", "content": "You answer questions using provided context only."},
-            {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {question}"},
-        ],
-        "temperature": 0.2,
-        "max_tokens": 300,
-    }
-
-    headers = {
-        "Authorization": f"Bearer {settings.openrouter_api_key}",
-        "Content-Type": "application/json",
-    }
-
-    async with httpx.AsyncClient(timeout=30) as client:
-        response = await client.post("https://openrouter.ai/api/v1/chat/completions", json=payload, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-        return data["choices"][0]["message"]["content"].strip()
+async def _retrieve_context(session: AsyncSession, payload: QuestionRequest, user: User) -> list[str]:
+    selected = await retrieve_chunks(session, payload.question, user.id, document_ids=payload.document_ids)
+    if not selected:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No ingested documents available")
+    excerpts = pack_context(payload.question, [chunk.content for chunk in selected])
+    if not excerpts:
+        # The question alone leaves no room for context under QA_CONTEXT_TOKENS.
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Question is too long")
+    return excerpts
 
 
 @router.post("", response_model=AnswerResponse)
 async def ask_question(
     payload: QuestionRequest,
     session: AsyncSession = Depends(get_db),
-    _: str = Depends(get_current_user),
+    user: User = Depends(get_current_user),
 ) -> AnswerResponse:
-    result = await session.execute(select(DocumentChunk))
-    chunks = list(result.scalars().all())
-    if not chunks:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No ingested documents available")
+    excerpts = await _retrieve_context(session, payload, user)
+    llm = await get_llm()
+    with llm_work("interactive", user.id):
+        answer = await llm.answer(payload.question, "\n\n".join(excerpts))
+    return AnswerResponse(answer=answer, excerpts=excerpts)
+
 
-    selected = select_relevant_chunks(payload.question, chunks)
-    context = "\n\n".join(chunk.content for chunk in selected)
-    answer = await _generate_answer(payload.question, context)
-    return AnswerResponse(answer=answer, excerpts=[chunk.content for chunk in selected])
+@router.post("/stream")
+async def ask_question_stream(
+    payload: QuestionRequest,
+    session: AsyncSession = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    # Server-sent events: `event: excerpts` with the retrieved chunks, then the answer tokens.
+    excerpts = await _retrieve_context(session, payload, user)
+    llm = await get_llm()
+
+    async def events():
+        yield sse_event(excerpts, "excerpts")
+        with llm_work("interactive", user.id):
+            async for event in token_events(llm.stream_answer(payload.question, "\n\n".join(excerpts))):
+                yield event
+
+    return sse_response(events())
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import json
+import logging
+from typing import Any, AsyncIterator
+
+from fastapi.responses import StreamingResponse
+
+from app.services.llm_scheduler import LLMUnavailableError
+
+logger = logging.getLogger("smart_qa.sse")
+
+
+def sse_event(data: Any, event: str | None = None) -> str:
+    lines = [f"event: {event}"] if event else []
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def token_events(tokens: AsyncIterator[str]) -> AsyncIterator[str]:
+    # One `data: {"token": ...}` event per chunk, then `event: done`. The status code is already
+    # sent, so a failure mid-stream is reported as `event: error`.
+    try:
+        async for token in tokens:
+            yield sse_event({"token": token})
+    except LLMUnavailableError as exc:
+        yield sse_event({"error_message": str(exc)}, "error")
+        return
+    except Exception as exc:  # noqa: BLE001
+        logger.exception("Streaming LLM response failed: %s", exc)
+        yield sse_event({"error_message": "LLM request failed"}, "error")
+        return
+    yield sse_event({}, "done")
+
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
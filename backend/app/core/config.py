@@ -28,12 +28,69 @@ class Settings(BaseSettings):
     llm_provider: str = Field(default="mock", alias="LLM_PROVIDER")
     llm_base_url: str | None = Field(default=None, alias="LLM_BASE_URL")
     llm_api_key: str | None = Field(default=None, alias="LLM_API_KEY")
+    openrouter_timeout_seconds: float = Field(default=30.0, alias="OPENROUTER_TIMEOUT_SECONDS")
+    llm_timeout_seconds: float = Field(default=30.0, alias="LLM_TIMEOUT_SECONDS")
+    llm_connect_timeout_seconds: float = Field(default=5.0, alias="LLM_CONNECT_TIMEOUT_SECONDS")
+    llm_http_max_connections: int = Field(default=100, alias="LLM_HTTP_MAX_CONNECTIONS")
+    llm_http_max_keepalive: int = Field(default=20, alias="LLM_HTTP_MAX_KEEPALIVE")
+    llm_http_keepalive_expiry: float = Field(default=30.0, alias="LLM_HTTP_KEEPALIVE_EXPIRY")
+    llm_http2: bool = Field(default=False, alias="LLM_HTTP2")
+    llm_cache_enabled: bool = Field(default=True, alias="LLM_CACHE_ENABLED")
+    llm_cache_ttl_seconds: int = Field(default=7 * 24 * 3600, alias="LLM_CACHE_TTL_SECONDS")
+    llm_cache_memory_entries: int = Field(default=1024, alias="LLM_CACHE_MEMORY_ENTRIES")
+    llm_cache_max_rows: int = Field(default=50000, alias="LLM_CACHE_MAX_ROWS")
+    llm_max_concurrency: int = Field(default=8, alias="LLM_MAX_CONCURRENCY")
+    llm_interactive_deadline_seconds: float = Field(default=30.0, alias="LLM_INTERACTIVE_DEADLINE_SECONDS")
+    llm_background_deadline_seconds: float = Field(default=900.0, alias="LLM_BACKGROUND_DEADLINE_SECONDS")
+    llm_provider_max_concurrency: int = Field(default=4, alias="LLM_PROVIDER_MAX_CONCURRENCY")
+    llm_rate_per_second: float = Field(default=2.0, alias="LLM_RATE_PER_SECOND")
+    llm_rate_burst: float = Field(default=5.0, alias="LLM_RATE_BURST")
+    llm_max_retries: int = Field(default=3, alias="LLM_MAX_RETRIES")
+    llm_retry_base_seconds: float = Field(default=0.5, alias="LLM_RETRY_BASE_SECONDS")
+    llm_retry_max_seconds: float = Field(default=20.0, alias="LLM_RETRY_MAX_SECONDS")
+    llm_breaker_failures: int = Field(default=8, alias="LLM_BREAKER_FAILURES")
+    llm_breaker_background_failures: int = Field(default=4, alias="LLM_BREAKER_BACKGROUND_FAILURES")
+    llm_breaker_reset_seconds: float = Field(default=30.0, alias="LLM_BREAKER_RESET_SECONDS")
+
+    chunk_max_tokens: int = Field(default=120, alias="CHUNK_MAX_TOKENS")
+    chunk_overlap_tokens: int = Field(default=20, alias="CHUNK_OVERLAP_TOKENS")
+    embedding_storage_dtype: str = Field(default="float32", alias="EMBEDDING_STORAGE_DTYPE")
+    vector_index_quantization: str = Field(default="none", alias="VECTOR_INDEX_QUANTIZATION")
+    vector_index_rerank_factor: int = Field(default=8, alias="VECTOR_INDEX_RERANK_FACTOR")
+    index_sync_overlap_ids: int = Field(default=1024, alias="INDEX_SYNC_OVERLAP_IDS")
+    index_reconcile_seconds: float = Field(default=300.0, alias="INDEX_RECONCILE_SECONDS")
+    retrieval_mode: str = Field(default="hybrid", alias="RETRIEVAL_MODE")
+    qa_context_tokens: int = Field(default=1500, alias="QA_CONTEXT_TOKENS")
+
+    cpu_workers: int = Field(default=2, alias="CPU_WORKERS")
+    cpu_offload_min_chars: int = Field(default=65536, alias="CPU_OFFLOAD_MIN_CHARS")
+    pdf_pages_per_task: int = Field(default=16, alias="PDF_PAGES_PER_TASK")
+
+    ingestion_workers: int = Field(default=2, alias="INGESTION_WORKERS")
+    ingestion_lease_seconds: int = Field(default=60, alias="INGESTION_LEASE_SECONDS")
+    ingestion_poll_seconds: float = Field(default=5.0, alias="INGESTION_POLL_SECONDS")
+    ingestion_max_attempts: int = Field(default=3, alias="INGESTION_MAX_ATTEMPTS")
+    ingestion_batch_size: int = Field(default=256, alias="INGESTION_BATCH_SIZE")
+    ingestion_batch_max_parallel: int = Field(default=2, alias="INGESTION_BATCH_MAX_PARALLEL")
+    book_pipeline_workers: int = Field(default=1, alias="BOOK_PIPELINE_WORKERS")
+    review_summary_debounce_seconds: float = Field(default=10.0, alias="REVIEW_SUMMARY_DEBOUNCE_SECONDS")
+    review_summary_max_delay_seconds: float = Field(default=60.0, alias="REVIEW_SUMMARY_MAX_DELAY_SECONDS")
+    review_summary_batch_tokens: int = Field(default=1500, alias="REVIEW_SUMMARY_BATCH_TOKENS")
+    review_summary_compact_after: int = Field(default=200, alias="REVIEW_SUMMARY_COMPACT_AFTER")
+
+    summary_section_tokens: int = Field(default=1500, alias="SUMMARY_SECTION_TOKENS")
+    summary_concurrency: int = Field(default=4, alias="SUMMARY_CONCURRENCY")
+    summary_reduce_fan_in: int = Field(default=8, alias="SUMMARY_REDUCE_FAN_IN")
 
     storage_provider: str = Field(default="local", alias="STORAGE_PROVIDER")
     storage_local_path: str = Field(default="./storage", alias="STORAGE_LOCAL_PATH")
     storage_bucket: str | None = Field(default=None, alias="STORAGE_BUCKET")
     storage_endpoint: str | None = Field(default=None, alias="STORAGE_ENDPOINT")
 
+    max_upload_bytes: int = Field(default=50 * 1024 * 1024, alias="MAX_UPLOAD_BYTES")
+    upload_chunk_bytes: int = Field(default=1024 * 1024, alias="UPLOAD_CHUNK_BYTES")
+    upload_spool_dir: str | None = Field(default=None, alias="UPLOAD_SPOOL_DIR")
+
     cors_origins: List[str] = Field(default=["http://localhost:5173"], alias="CORS_ORIGINS")
 
     admin_email: str = Field(default="admin@example.com", alias="ADMIN_EMAIL")
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import logging
+
+from sqlalchemy import Boolean, Connection, DateTime, Integer, LargeBinary, String, inspect, select, text, update
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.types import TypeEngine
+
+from app.models.document import Document
+from app.models.document_chunk import DocumentChunk
+from app.services.embedding import pack_embedding
+from app.services.ingestion import chunk_hash
+
+logger = logging.getLogger("smart_qa.migrations")
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def _add_missing_columns(conn: Connection, table: str, columns: dict[str, tuple[TypeEngine, str]]) -> set[str]:
+    existing = {column["name"] for column in inspect(conn).get_columns(table)}
+    added = set()
+    for name, (column_type, extra) in columns.items():
+        if name in existing:
+            continue
+        ddl = f"ALTER TABLE {table} ADD COLUMN {name} {column_type.compile(dialect=conn.dialect)} {extra}"
+        conn.execute(text(ddl.strip()))
+        logger.info("Added %s.%s column", table, name)
+        added.add(name)
+    return added
+
+
+def _ensure_chunk_columns(conn: Connection) -> None:
+    columns = {column["name"]: column for column in inspect(conn).get_columns("document_chunks")}
+    if not columns["embedding"]["nullable"] and conn.dialect.name == "sqlite":
+        _rebuild_sqlite_chunks(conn, list(columns))
+        return
+    added = _add_missing_columns(
+        conn,
+        "document_chunks",
+        {
+            "vector": (LargeBinary(), ""),
+            "owner_id": (Integer(), "REFERENCES users(id) ON DELETE CASCADE"),
+            "content_hash": (String(64), ""),
+        },
+    )
+    for column in {"owner_id", "content_hash"} & added:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_document_chunks_{column} ON document_chunks ({column})"))
+    if not columns["embedding"]["nullable"]:
+        conn.execute(text("ALTER TABLE document_chunks ALTER COLUMN embedding DROP NOT NULL"))
+
+
+def _rebuild_sqlite_chunks(conn: Connection, legacy_columns: list[str]) -> None:
+    # SQLite cannot drop NOT NULL in place: move the old table aside, create the current one with
+    # its indexes, copy the rows over and drop the old table. Added columns are filled in by the
+    # backfills.
+    conn.execute(text("ALTER TABLE document_chunks RENAME TO document_chunks_legacy"))
+    for index in inspect(conn).get_indexes("document_chunks_legacy"):
+        conn.execute(text(f"DROP INDEX IF EXISTS {index['name']}"))
+    DocumentChunk.__table__.create(conn)
+    shared = ", ".join(name for name in DocumentChunk.__table__.columns.keys() if name in legacy_columns)
+    conn.execute(text(f"INSERT INTO document_chunks ({shared}) SELECT {shared} FROM document_chunks_legacy"))
+    conn.execute(text("DROP TABLE document_chunks_legacy"))
+    logger.info("Rebuilt document_chunks with a nullable embedding column")
+
+
+def _ensure_job_columns(conn: Connection) -> None:
+    added = _add_missing_columns(
+        conn,
+        "ingestion_jobs",
+        {
+            "mode": (String(20), "NOT NULL DEFAULT 'incremental'"),
+            "chunks_processed": (Integer(), "NOT NULL DEFAULT 0"),
+            "attempts": (Integer(), "NOT NULL DEFAULT 0"),
+            "lease_owner": (String(255), ""),
+            "lease_expires_at": (DateTime(timezone=True), ""),
+            "batch_id": (Integer(), "REFERENCES ingestion_batches(id) ON DELETE CASCADE"),
+        },
+    )
+    if "batch_id" in added:
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_ingestion_jobs_batch_id ON ingestion_jobs (batch_id)"))
+
+
+def _ensure_book_columns(conn: Connection) -> None:
+    _add_missing_columns(
+        conn,
+        "books",
+        {
+            "processing_status": (String(20), "NOT NULL DEFAULT 'ready'"),
+            "processing_error": (String(500), ""),
+            "review_summary_watermark": (Integer(), ""),
+            "review_summary_rolled": (Integer(), "NOT NULL DEFAULT 0"),
+        },
+    )
+
+
+def _ensure_review_columns(conn: Connection) -> None:
+    if _add_missing_columns(conn, "reviews", {"summarized": (Boolean(), "NOT NULL DEFAULT false")}):
+        # Everything up to the old watermark was already folded into the book's review summary.
+        conn.execute(
+            text(
+                "UPDATE reviews SET summarized = true WHERE id <= "
+                "(SELECT review_summary_watermark FROM books WHERE books.id = reviews.book_id)"
+            )
+        )
+
+
+def _ensure_book_job_columns(conn: Connection) -> None:
+    _add_missing_columns(conn, "book_processing_jobs", {"run_after": (DateTime(timezone=True), "")})
+
+
+def _ensure_file_hash_columns(conn: Connection) -> None:
+    for table in ("books", "documents"):
+        if _add_missing_columns(conn, table, {"file_hash": (String(64), "")}):
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_file_hash ON {table} (file_hash)"))
+
+
+async def backfill_chunk_vectors(session: AsyncSession, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    migrated = 0
+    while True:
+        result = await session.execute(
+            select(DocumentChunk.id, DocumentChunk.embedding)
+            .where(DocumentChunk.vector.is_(None), DocumentChunk.embedding.is_not(None))
+            .order_by(DocumentChunk.id)
+            .limit(batch_size)
+        )
+        rows = result.all()
+        if not rows:
+            break
+        await session.execute(
+            update(DocumentChunk),
+            [{"id": chunk_id, "vector": pack_embedding(embedding), "embedding": None} for chunk_id, embedding in rows],
+        )
+        await session.commit()
+        migrated += len(rows)
+    if migrated:
+        logger.info("Packed %s legacy JSON chunk embeddings", migrated)
+    return migrated
+
+
+async def backfill_chunk_owners(session: AsyncSession) -> int:
+    owner_subquery = select(Document.owner_id).where(Document.id == DocumentChunk.document_id).scalar_subquery()
+    result = await session.execute(
+        update(DocumentChunk)
+        .where(DocumentChunk.owner_id.is_(None))
+        .values(owner_id=owner_subquery)
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    if result.rowcount:
+        logger.info("Backfilled owner_id on %s chunks", result.rowcount)
+    return result.rowcount
+
+
+async def backfill_chunk_hashes(session: AsyncSession, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    migrated = 0
+    while True:
+        result = await session.execute(
+            select(DocumentChunk.id, DocumentChunk.content)
+            .where(DocumentChunk.content_hash.is_(None))
+            .order_by(DocumentChunk.id)
+            .limit(batch_size)
+        )
+        rows = result.all()
+        if not rows:
+            break
+        await session.execute(
+            update(DocumentChunk),
+            [{"id": chunk_id, "content_hash": chunk_hash(content)} for chunk_id, content in rows],
+        )
+        await session.commit()
+        migrated += len(rows)
+    if migrated:
+        logger.info("Hashed %s existing chunks", migrated)
+    return migrated
+
+
+async def run_migrations(engine: AsyncEngine, session: AsyncSession) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(_ensure_chunk_columns)
+        await conn.run_sync(_ensure_job_columns)
+        await conn.run_sync(_ensure_book_columns)
+        await conn.run_sync(_ensure_review_columns)
+        await conn.run_sync(_ensure_book_job_columns)
+        await conn.run_sync(_ensure_file_hash_columns)
+        # Section summaries are cached in llm_cache_entries now.
+        await conn.execute(text("DROP TABLE IF EXISTS section_summaries"))
+    await backfill_chunk_vectors(session)
+    await backfill_chunk_owners(session)
+    await backfill_chunk_hashes(session)
@@ -15,9 +15,31 @@ from app.core.config import settings
 from app.core.logging import configure_logging
 from app.core.security import hash_password
 from app.db.base import Base
+from app.db.migrations import run_migrations
 from app.db.session import SessionLocal, engine
-from app.models import book, borrow, document, document_chunk, ingestion_job, review, user, user_preference
+from app.models import (
+    book,
+    book_processing_job,
+    borrow,
+    document,
+    document_chunk,
+    ingestion_batch,
+    ingestion_job,
+    llm_cache_entry,
+    review,
+    stored_file,
+    user,
+    user_preference,
+)
 from app.models.user import User
+from app.services.book_pipeline import get_book_pipeline
+from app.services.compute import shutdown_process_pool
+from app.services.http_client import close_http_client, get_http_client
+from app.services.ingestion_queue import get_ingestion_scheduler
+from app.services.llm_scheduler import LLMUnavailableError
+from app.services.text_index import load_chunk_text_indexes
+from app.services.uploads import UploadLimitMiddleware, UploadTooLargeError
+from app.services.vector_index import load_chunk_indexes
 
 configure_logging()
 logger = logging.getLogger("smart_qa")
@@ -28,6 +50,8 @@ async def init_models() -> None:
         await conn.run_sync(Base.metadata.create_all)
 
     async with SessionLocal() as session:
+        await run_migrations(engine, session)
+
         result = await session.execute(select(User).where(User.email == settings.admin_email))
         if not result.scalar_one_or_none():
             admin = User(
@@ -39,14 +63,31 @@ async def init_models() -> None:
             await session.commit()
 
 
+async def warm_chunk_indexes() -> None:
+    async with SessionLocal() as session:
+        await load_chunk_indexes(session)
+        await load_chunk_text_indexes(session)
+
+
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     await init_models()
+    await warm_chunk_indexes()
+    get_http_client()
+    scheduler = get_ingestion_scheduler()
+    pipeline = get_book_pipeline()
+    scheduler.start()
+    pipeline.start()
     yield
+    await pipeline.stop()
+    await scheduler.stop()
+    await close_http_client()
+    shutdown_process_pool()
 
 
 app = FastAPI(title=settings.app_name, lifespan=lifespan)
 
+app.add_middleware(UploadLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.cors_origins,
@@ -61,7 +102,8 @@ async def response_wrapper(request: Request, call_next):
     if request.url.path in {"/openapi.json", "/docs", "/docs/oauth2-redirect", "/redoc"}:
         return await call_next(request)
     response = await call_next(request)
-    if response.status_code == 204:
+    # Server-sent events are passed through unbuffered so tokens reach the client as they arrive.
+    if response.status_code == 204 or response.headers.get("content-type", "").startswith("text/event-stream"):
         return response
 
     body = b""
@@ -119,6 +161,16 @@ async def http_exception_handler(_, exc: HTTPException):
     return JSONResponse(status_code=exc.status_code, content={"error_message": exc.detail})
 
 
+@app.exception_handler(UploadTooLargeError)
+async def upload_too_large_handler(_, exc: UploadTooLargeError):
+    return JSONResponse(status_code=413, content={"error_message": str(exc)})
+
+
+@app.exception_handler(LLMUnavailableError)
+async def llm_unavailable_handler(_, exc: LLMUnavailableError):
+    return JSONResponse(status_code=503, content={"error_message": str(exc)})
+
+
 @app.exception_handler(Exception)
 async def unhandled_exception_handler(_, exc: Exception):
     logger.exception("Unhandled error: %s", exc)
@@ -20,7 +20,16 @@ class Book(Base):
     file_name: Mapped[str | None] = mapped_column(String(255))
     content_type: Mapped[str | None] = mapped_column(String(100))
     file_size: Mapped[int | None] = mapped_column(Integer)
+    # SHA-256 of the stored file, computed while the upload is spooled.
+    file_hash: Mapped[str | None] = mapped_column(String(64), index=True)
     content_text: Mapped[str | None] = mapped_column(Text)
     summary: Mapped[str | None] = mapped_column(Text)
     review_summary: Mapped[str | None] = mapped_column(Text)
+    # Id of the newest review folded into review_summary (Review.summarized marks each one), and how
+    # many reviews were rolled in incrementally since the last full pass; see app.services.book_pipeline.
+    review_summary_watermark: Mapped[int | None] = mapped_column(Integer)
+    review_summary_rolled: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    # queued -> extracting -> summarizing -> ready, or failed; see app.services.book_pipeline.
+    processing_status: Mapped[str] = mapped_column(String(20), default="ready", server_default="ready", nullable=False)
+    processing_error: Mapped[str | None] = mapped_column(String(500))
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
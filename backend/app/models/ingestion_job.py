@@ -13,7 +13,13 @@ class IngestionJob(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     document_id: Mapped[int] = mapped_column(ForeignKey("documents.id", ondelete="CASCADE"), index=True)
+    batch_id: Mapped[int | None] = mapped_column(ForeignKey("ingestion_batches.id", ondelete="CASCADE"), index=True)
     status: Mapped[str] = mapped_column(String(50), default="pending", nullable=False)
+    mode: Mapped[str] = mapped_column(String(20), default="incremental", server_default="incremental", nullable=False)
     error: Mapped[str | None] = mapped_column(String(500))
+    chunks_processed: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    lease_owner: Mapped[str | None] = mapped_column(String(255))
+    lease_expires_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
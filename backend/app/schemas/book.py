@@ -30,11 +30,32 @@ class BookRead(BaseModel):
     file_size: int | None
     summary: str | None
     review_summary: str | None
+    processing_status: str
+    processing_error: str | None
     created_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
 
 
+class BookProcessingStageRead(BaseModel):
+    id: int
+    stage: str
+    status: str
+    error: str | None
+    attempts: int
+    created_at: datetime
+    updated_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class BookProcessingRead(BaseModel):
+    book_id: int
+    processing_status: str
+    processing_error: str | None
+    stages: list[BookProcessingStageRead]
+
+
 class BookSummaryRead(BaseModel):
     book_id: int
     summary: str | None
@@ -2,15 +2,46 @@ from __future__ import annotations
 
 from datetime import datetime
 
-from pydantic import BaseModel, ConfigDict
+from typing import Literal
+
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class IngestionJobRead(BaseModel):
     id: int
     document_id: int
+    batch_id: int | None
     status: str
+    mode: str
     error: str | None
+    chunks_processed: int
+    attempts: int
     created_at: datetime
     updated_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class IngestionBatchCreate(BaseModel):
+    document_ids: list[int] | None = Field(default=None, min_length=1, max_length=10000)
+    all_uningested: bool = False
+    mode: Literal["incremental", "full"] = "incremental"
+    max_parallel: int | None = Field(default=None, ge=1)
+
+
+class IngestionBatchRead(BaseModel):
+    id: int
+    status: str
+    mode: str
+    max_parallel: int
+    total_jobs: int
+    pending: int
+    running: int
+    completed: int
+    failed: int
+    chunks_processed: int
+    elapsed_seconds: float
+    documents_per_second: float
+    chunks_per_second: float
+    created_at: datetime
+    finished_at: datetime | None
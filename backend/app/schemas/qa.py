@@ -3,6 +3,7 @@ from pydantic import BaseModel
 
 class QuestionRequest(BaseModel):
     question: str
+    document_ids: list[int] | None = None
 
 
 class AnswerResponse(BaseModel):
@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, exists, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.book import Book
+from app.models.book_processing_job import BookProcessingJob
+from app.models.review import Review
+from app.services.file_store import find_extracted_text
+from app.services.job_queue import LeasedJobScheduler, as_utc, utcnow
+from app.services.llm import get_llm_provider
+from app.services.llm_scheduler import llm_work
+from app.services.review_analysis import generate_review_summary, update_review_summary
+from app.services.storage import get_storage_provider
+from app.services.summarizer import generate_summary
+from app.services.text_extraction import content_type_for, iter_file_text
+from app.services.uploads import spooled_download
+
+logger = logging.getLogger("smart_qa.books")
+
+# Book status while each upload stage runs. Review summaries do not change processing_status.
+STAGE_STATUS = {"extract": "extracting", "summarize": "summarizing"}
+REVIEW_STAGE = "review_summary"
+REVIEW_MARK_BATCH = 500
+
+
+def queue_stage(book: Book, stage: str) -> BookProcessingJob:
+    book.processing_status = "queued" if stage == "extract" else STAGE_STATUS[stage]
+    book.processing_error = None
+    return BookProcessingJob(book_id=book.id, stage=stage, status="pending")
+
+
+async def queue_review_summary(session: AsyncSession, book_id: int) -> None:
+    # Debounce: each new review pushes the pending job back by the quiet window, but never past
+    # max_delay after the first review of the burst. Commit with the review so the job the
+    # regeneration coalesces is never ahead of the reviews it reads.
+    now = utcnow()
+    result = await session.execute(
+        select(BookProcessingJob)
+        .where(
+            BookProcessingJob.book_id == book_id,
+            BookProcessingJob.stage == REVIEW_STAGE,
+            BookProcessingJob.status == "pending",
+        )
+        .order_by(BookProcessingJob.id.desc())
+        .limit(1)
+    )
+    job = result.scalar_one_or_none()
+    quiet_until = now + timedelta(seconds=settings.review_summary_debounce_seconds)
+    if job is None:
+        session.add(BookProcessingJob(book_id=book_id, stage=REVIEW_STAGE, status="pending", run_after=quiet_until))
+        return
+    deadline = as_utc(job.created_at) + timedelta(seconds=settings.review_summary_max_delay_seconds)
+    job.run_after = min(quiet_until, max(deadline, now))
+
+
+async def _extract(session: AsyncSession, job: BookProcessingJob, book: Book) -> str | None:
+    # Returns the stage to queue next. Extracted pages are fed to the summarizer as they arrive, so
+    # sections of a large PDF are summarized while later page ranges are still being parsed.
+    cached = await find_extracted_text(session, book.file_hash) if book.file_hash else None
+    if cached is not None:
+        book.content_text = cached
+        return "summarize" if cached else None
+    name = book.file_name or book.file_key
+    llm = await get_llm_provider()
+    storage = await get_storage_provider()
+    queue: asyncio.Queue[str | None] = asyncio.Queue()
+
+    async def pages():
+        while (piece := await queue.get()) is not None:
+            yield piece
+
+    summary = asyncio.ensure_future(generate_summary(pages(), llm))
+    pieces: list[str] = []
+    try:
+        async with spooled_download(storage, book.file_key) as path:
+            async for piece in iter_file_text(name, path):
+                pieces.append(piece)
+                if not summary.done():
+                    queue.put_nowait(piece)
+        queue.put_nowait(None)
+    except BaseException:
+        summary.cancel()
+        raise
+    book.content_text = "".join(pieces)
+    book.content_type = content_type_for(name)
+    try:
+        summary_text = await summary
+    except Exception as exc:  # noqa: BLE001
+        # Keep the extracted text; the summarize stage retries the summary on its own.
+        logger.warning("Book %s summary during extraction failed: %s", book.id, exc)
+        return "summarize" if book.content_text else None
+    if book.content_text:
+        book.summary = summary_text
+    return None
+
+
+async def _summarize(session: AsyncSession, job: BookProcessingJob, book: Book) -> None:
+    llm = await get_llm_provider()
+    book.summary = await generate_summary(book.content_text or "", llm)
+
+
+async def _summarize_reviews(session: AsyncSession, job: BookProcessingJob, book: Book) -> None:
+    # Every review committed so far is read below, so other pending requests for this book are
+    # covered by this run.
+    await session.execute(
+        update(BookProcessingJob)
+        .where(
+            BookProcessingJob.book_id == book.id,
+            BookProcessingJob.stage == REVIEW_STAGE,
+            BookProcessingJob.status == "pending",
+            BookProcessingJob.id != job.id,
+        )
+        .values(status="coalesced")
+    )
+    # Normally only reviews not yet folded in are sent, on top of the current consensus. They are
+    # picked by their summarized flag rather than by id above the watermark: ids are assigned before
+    # commit, so a review can become visible after a higher id was already summarized. A full
+    # map-reduce pass runs for the first summary and once compact_after reviews have been rolled
+    # in, so drift from repeated incremental updates does not build up.
+    full = (
+        book.review_summary_watermark is None
+        or not book.review_summary
+        or book.review_summary_rolled >= settings.review_summary_compact_after
+    )
+    query = select(Review.id, Review.review_text).where(Review.book_id == book.id).order_by(Review.id)
+    if not full:
+        query = query.where(Review.summarized.is_(False))
+    rows = (await session.execute(query)).all()
+    if not rows:
+        return
+    llm = await get_llm_provider()
+    texts = [text for _, text in rows]
+    if full:
+        book.review_summary = await generate_review_summary(texts, llm)
+        book.review_summary_rolled = 0
+    else:
+        book.review_summary = await update_review_summary(book.review_summary, texts, llm)
+        book.review_summary_rolled += len(rows)
+    ids = [review_id for review_id, _ in rows]
+    for start in range(0, len(ids), REVIEW_MARK_BATCH):
+        await session.execute(
+            update(Review).where(Review.id.in_(ids[start : start + REVIEW_MARK_BATCH])).values(summarized=True)
+        )
+    book.review_summary_watermark = max(book.review_summary_watermark or 0, ids[-1])
+
+
+STAGES = {"extract": _extract, "summarize": _summarize, REVIEW_STAGE: _summarize_reviews}
+
+
+class BookPipelineScheduler(LeasedJobScheduler):
+    # Extraction, summarization and review consensus for books. Each stage is a row in
+    # book_processing_jobs, so queued work survives restarts; a failed stage is retried up to
+    # max_attempts times. A job waits until its run_after, and two jobs of the same stage never
+    # run for one book at the same time.
+
+    model = BookProcessingJob
+    name = "book processing"
+
+    def claim_filter(self, now: datetime):
+        sibling = aliased(BookProcessingJob)
+        busy = exists().where(
+            sibling.book_id == BookProcessingJob.book_id,
+            sibling.stage == BookProcessingJob.stage,
+            sibling.id != BookProcessingJob.id,
+            sibling.status == "running",
+            sibling.lease_expires_at >= now,
+        )
+        return and_(or_(BookProcessingJob.run_after.is_(None), BookProcessingJob.run_after <= now), ~busy)
+
+    async def process(self, job_id: int) -> None:
+        async with SessionLocal() as session:
+            job = await session.get(BookProcessingJob, job_id)
+            if not job:
+                return
+            book = await session.get(Book, job.book_id)
+            if not book:
+                await self.fail(session, job_id, "Book not found")
+                await session.commit()
+                return
+
+            tracked = job.stage in STAGE_STATUS
+            if tracked:
+                book.processing_status = STAGE_STATUS[job.stage]
+                await session.commit()
+            try:
+                with llm_work("background", f"book:{book.id}"):
+                    next_stage = await STAGES[job.stage](session, job, book)
+                next_job = None
+                if next_stage is not None:
+                    next_job = queue_stage(book, next_stage)
+                    session.add(next_job)
+                elif tracked:
+                    book.processing_status = "ready"
+                job.status = "completed"
+                job.error = None
+                job.lease_owner = None
+                job.lease_expires_at = None
+                await session.commit()
+            except Exception as exc:  # noqa: BLE001
+                logger.exception("Book %s %s stage failed: %s", job.book_id, job.stage, exc)
+                await session.rollback()
+                await self.fail(session, job_id, str(exc)[:500])
+                await session.commit()
+                return
+        if next_job is not None:
+            self.notify()
+
+    async def fail(self, session, job_id: int, error: str) -> None:
+        result = await session.execute(
+            select(BookProcessingJob.book_id, BookProcessingJob.stage, BookProcessingJob.attempts).where(
+                BookProcessingJob.id == job_id
+            )
+        )
+        book_id, stage, attempts = result.one()
+        if attempts < self.max_attempts and error != "Book not found":
+            # Leave the lease to expire so the retry is not claimed in a tight loop.
+            await session.execute(
+                update(BookProcessingJob).where(BookProcessingJob.id == job_id).values(error=error)
+            )
+            return
+        await super().fail(session, job_id, error)
+        if stage in STAGE_STATUS:
+            await session.execute(
+                update(Book).where(Book.id == book_id).values(processing_status="failed", processing_error=error)
+            )
+
+
+_pipeline = BookPipelineScheduler(
+    workers=settings.book_pipeline_workers,
+    lease_seconds=settings.ingestion_lease_seconds,
+    poll_seconds=settings.ingestion_poll_seconds,
+    max_attempts=settings.ingestion_max_attempts,
+)
+
+
+def get_book_pipeline() -> BookPipelineScheduler:
+    return _pipeline
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, TypeVar
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+_executor: ProcessPoolExecutor | None = None
+
+
+def get_process_pool() -> ProcessPoolExecutor | None:
+    global _executor
+    if settings.cpu_workers <= 0:
+        return None
+    if _executor is None:
+        # Spawned workers only import what the submitted function needs and never inherit
+        # the event loop, sockets or DB connections of the API process.
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.cpu_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+async def run_cpu_bound(func: Callable[..., T], *args: Any) -> T:
+    pool = get_process_pool()
+    if pool is None:
+        return await asyncio.to_thread(func, *args)
+    return await asyncio.get_running_loop().run_in_executor(pool, partial(func, *args))
+
+
+def shutdown_process_pool() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
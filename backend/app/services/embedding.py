@@ -1,34 +1,79 @@
 from __future__ import annotations
 
-import math
 import re
+from functools import lru_cache
 from hashlib import blake2b
 
+import numpy as np
+
 EMBEDDING_SIZE = 128
 
 
-def _tokenize(text: str) -> list[str]:
+def tokenize(text: str) -> list[str]:
     return re.findall(r"\b\w+\b", text.lower())
 
 
-def embed_text(text: str) -> list[float]:
-    vector = [0.0] * EMBEDDING_SIZE
-    tokens = _tokenize(text)
-    if not tokens:
-        return vector
+@lru_cache(maxsize=65536)
+def _token_bucket(token: str) -> int:
+    digest = blake2b(token.encode("utf-8"), digest_size=4).digest()
+    return int.from_bytes(digest, "big") % EMBEDDING_SIZE
+
+
+def embed_texts(texts: list[str], dtype=np.float32) -> np.ndarray:
+    rows: list[int] = []
+    buckets: list[int] = []
+    for row, text in enumerate(texts):
+        token_buckets = [_token_bucket(token) for token in tokenize(text)]
+        buckets.extend(token_buckets)
+        rows.extend([row] * len(token_buckets))
 
-    for token in tokens:
-        digest = blake2b(token.encode("utf-8"), digest_size=4).hexdigest()
-        idx = int(digest, 16) % EMBEDDING_SIZE
-        vector[idx] += 1.0
+    flat = np.asarray(rows, dtype=np.int64) * EMBEDDING_SIZE + np.asarray(buckets, dtype=np.int64)
+    counts = np.bincount(flat, minlength=len(texts) * EMBEDDING_SIZE).astype(np.float64)
+    counts = counts.reshape(len(texts), EMBEDDING_SIZE)
 
-    norm = math.sqrt(sum(value * value for value in vector))
-    if norm == 0:
-        return vector
-    return [value / norm for value in vector]
+    # Counts are small integers, so the float64 norm is exact and matches the scalar scheme.
+    norms = np.sqrt((counts * counts).sum(axis=1, keepdims=True))
+    np.divide(counts, norms, out=counts, where=norms > 0)
+    return counts.astype(dtype, copy=False)
+
+
+def embed_text(text: str) -> list[float]:
+    return embed_texts([text], dtype=np.float64)[0].tolist()
 
 
 def cosine_similarity(a: list[float], b: list[float]) -> float:
     if not a or not b:
         return 0.0
     return sum(x * y for x, y in zip(a, b))
+
+
+def cosine_similarities(query, matrix) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.size == 0:
+        return np.zeros(len(matrix), dtype=np.float32)
+    return matrix @ np.asarray(query, dtype=np.float32)
+
+
+def _storage_dtype(name: str | None = None) -> np.dtype:
+    from app.core.config import settings
+
+    name = name or settings.embedding_storage_dtype
+    if name not in {"float32", "float16"}:
+        raise ValueError(f"Unsupported embedding storage dtype: {name}")
+    return np.dtype(name).newbyteorder("<")
+
+
+def pack_embedding(vector, dtype: str | None = None) -> bytes:
+    return np.asarray(vector).astype(_storage_dtype(dtype)).tobytes()
+
+
+def unpack_embeddings(blobs: list[bytes]) -> np.ndarray:
+    if not blobs:
+        return np.zeros((0, EMBEDDING_SIZE), dtype=np.float32)
+    # The stored width identifies the dtype: 4 bytes per value for float32, 2 for float16.
+    width = len(blobs[0])
+    if all(len(blob) == width for blob in blobs):
+        dtype = _storage_dtype("float16" if width == EMBEDDING_SIZE * 2 else "float32")
+        matrix = np.frombuffer(b"".join(blobs), dtype=dtype).reshape(len(blobs), EMBEDDING_SIZE)
+        return matrix.astype(np.float32)
+    return np.vstack([unpack_embeddings([blob]) for blob in blobs])
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import SessionLocal
+from app.models.book import Book
+from app.models.document import Document
+from app.models.stored_file import StoredFile
+from app.services.storage import StorageProvider
+from app.services.uploads import SpooledUpload
+
+
+def content_key(content_hash: str, filename: str) -> str:
+    return f"{content_hash}{Path(filename).suffix.lower()}"
+
+
+async def acquire_stored_file(session: AsyncSession, storage: StorageProvider, upload: SpooledUpload) -> str:
+    # Takes the reference inside the caller's transaction, so it is dropped again if the caller
+    # rolls back and holds the row lock until the caller commits. An object saved for a row that
+    # is then rolled back stays behind unreferenced; the next upload of the same bytes reuses its key.
+    while True:
+        key = await _add_reference(session, upload.sha256)
+        if key is not None:
+            return key
+
+        key = await storage.save_file(upload.filename, upload.path, key=content_key(upload.sha256, upload.filename))
+        try:
+            async with session.begin_nested():
+                session.add(StoredFile(content_hash=upload.sha256, storage_key=key, size=upload.size, ref_count=1))
+        except IntegrityError:
+            # A concurrent upload of the same content registered it first; reference that row.
+            continue
+        return key
+
+
+async def release_stored_file(storage: StorageProvider, key: str) -> None:
+    # Call after the caller has committed the change that dropped its reference. The object is
+    # deleted before this transaction commits, while it still holds the row lock, so a concurrent
+    # acquire cannot re-register the key and then lose the object to this delete.
+    async with SessionLocal() as session:
+        result = await session.execute(
+            update(StoredFile)
+            .where(StoredFile.storage_key == key)
+            .values(ref_count=StoredFile.ref_count - 1)
+            .returning(StoredFile.ref_count)
+        )
+        remaining = result.scalar_one_or_none()
+        if remaining is None:
+            # Uploaded before content addressing; nothing else can reference it.
+            await storage.delete(key)
+        elif remaining <= 0:
+            await session.execute(delete(StoredFile).where(StoredFile.storage_key == key))
+            await storage.delete(key)
+        await session.commit()
+
+
+async def find_extracted_text(session: AsyncSession, content_hash: str) -> str | None:
+    # Any book or document uploaded from the same bytes already holds the extracted text.
+    for statement in (
+        select(Book.content_text).where(Book.file_hash == content_hash, Book.content_text.is_not(None)),
+        select(Document.content).where(Document.file_hash == content_hash),
+    ):
+        result = await session.execute(statement.limit(1))
+        text = result.scalar_one_or_none()
+        if text is not None:
+            return text
+    return None
+
+
+async def _add_reference(session: AsyncSession, content_hash: str) -> str | None:
+    result = await session.execute(
+        update(StoredFile)
+        .where(StoredFile.content_hash == content_hash)
+        .values(ref_count=StoredFile.ref_count + 1)
+        .returning(StoredFile.storage_key)
+    )
+    return result.scalar_one_or_none()
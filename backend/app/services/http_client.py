@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import logging
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger("smart_qa.http")
+
+_client: httpx.AsyncClient | None = None
+_loop: asyncio.AbstractEventLoop | None = None
+
+
+def _build_client() -> httpx.AsyncClient:
+    http2 = settings.llm_http2
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("LLM_HTTP2 is enabled but the h2 package is missing; using HTTP/1.1")
+        http2 = False
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=settings.llm_http_max_connections,
+            max_keepalive_connections=settings.llm_http_max_keepalive,
+            keepalive_expiry=settings.llm_http_keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(settings.llm_timeout_seconds, connect=settings.llm_connect_timeout_seconds),
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    # Opened by the app lifespan; created lazily for scripts and tests that run without it.
+    # Pooled connections belong to one event loop, so a new loop gets a new client.
+    global _client, _loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _loop is not loop:
+        _client = _build_client()
+        _loop = loop
+    return _client
+
+
+def provider_timeout(read_seconds: float) -> httpx.Timeout:
+    return httpx.Timeout(read_seconds, connect=settings.llm_connect_timeout_seconds)
+
+
+async def close_http_client() -> None:
+    global _client, _loop
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _loop = None
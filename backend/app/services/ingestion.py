@@ -1,13 +1,250 @@
 from __future__ import annotations
 
-from app.services.embedding import embed_text
+import asyncio
+import re
+import zlib
+from collections import deque
+from collections.abc import AsyncIterable, AsyncIterator, Callable, Iterable, Iterator
+from hashlib import blake2b
 
+import numpy as np
 
-def chunk_text(text: str, chunk_size: int = 500) -> list[str]:
-    normalized = text.replace("\r\n", "\n").replace("\r", "\n")
-    return [normalized[i : i + chunk_size] for i in range(0, len(normalized), chunk_size) if normalized[i : i + chunk_size].strip()]
+from app.core.config import settings
+from app.services.compute import run_cpu_bound
+from app.services.embedding import embed_texts
 
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+# A blank line ends a paragraph; terminal punctuation followed by whitespace ends a sentence.
+BOUNDARY_PATTERN = re.compile(r"\n[ \t]*\n\s*|(?<=[.!?])\s+")
+MAX_PENDING_CHARS = 65536
+OFFLOAD_SLICE_CHARS = 65536
+EMBEDDING_BATCH_SIZE = 64
 
-def build_embeddings(text: str, chunk_size: int = 500) -> list[tuple[str, list[float]]]:
-    chunks = chunk_text(text, chunk_size=chunk_size)
-    return [(chunk, embed_text(chunk)) for chunk in chunks]
+
+def count_tokens(text: str) -> int:
+    return len(TOKEN_PATTERN.findall(text))
+
+
+def _split_long(unit: str, max_tokens: int) -> Iterator[tuple[str, int]]:
+    tokens = count_tokens(unit)
+    if tokens <= max_tokens:
+        yield unit, tokens
+        return
+    words: list[str] = []
+    word_tokens = 0
+    for word in unit.split():
+        size = count_tokens(word)
+        if words and word_tokens + size > max_tokens:
+            yield " ".join(words), word_tokens
+            words, word_tokens = [], 0
+        words.append(word)
+        word_tokens += size
+    if words:
+        yield " ".join(words), word_tokens
+
+
+def _join(window: list[tuple[str, int, bool]]) -> str:
+    parts = [window[0][0]]
+    for text, _, paragraph in window[1:]:
+        parts.append("\n\n" if paragraph else " ")
+        parts.append(text)
+    return "".join(parts)
+
+
+class Chunker:
+    # Sentence- and paragraph-aware chunking as a resumable state machine: feed() pieces of text,
+    # then finish(). The state is the unfinished unit and the current window, so it stays small and
+    # can be handed to a worker process along with each slice of a large text.
+
+    def __init__(self, max_tokens: int | None = None, overlap_tokens: int | None = None) -> None:
+        self.max_tokens = max_tokens or settings.chunk_max_tokens
+        self.overlap_tokens = settings.chunk_overlap_tokens if overlap_tokens is None else overlap_tokens
+        self._buffer = ""
+        self._paragraph = True
+        self._window: list[tuple[str, int, bool]] = []
+        self._window_tokens = 0
+        self._fresh_tokens = 0
+        self._paragraph_tokens = 0
+        self._last: tuple[int, int] = (0, 0)
+
+    def feed(self, piece: str) -> Iterator[str]:
+        for unit, paragraph in self._units(piece):
+            yield from self._add(unit, paragraph)
+
+    def finish(self) -> Iterator[str]:
+        tail = self._buffer.strip()
+        self._buffer = ""
+        if tail:
+            yield from self._add(tail, self._paragraph)
+        if self._window:
+            yield _join(self._window)
+        self._window, self._window_tokens = [], 0
+        self._fresh_tokens, self._paragraph_tokens, self._last = 0, 0, (0, 0)
+
+    def _units(self, piece: str) -> Iterator[tuple[str, bool]]:
+        buffer = self._buffer + piece
+        # A "\r\n" can be split across pieces, so a trailing "\r" waits for the next one.
+        held = "\r" if buffer.endswith("\r") else ""
+        buffer = buffer[: len(buffer) - len(held)].replace("\r\n", "\n").replace("\r", "\n")
+        pos = 0
+        for match in BOUNDARY_PATTERN.finditer(buffer):
+            unit = buffer[pos : match.start()].strip()
+            if unit:
+                yield unit, self._paragraph
+                self._paragraph = False
+            if match.end() == len(buffer):
+                # The next piece may continue this whitespace (a blank line split across pieces).
+                pos = match.start()
+                break
+            self._paragraph = self._paragraph or match.group().count("\n") >= 2
+            pos = match.end()
+        buffer = buffer[pos:]
+        # Text without any boundary must not grow the buffer without limit.
+        while len(buffer) > MAX_PENDING_CHARS:
+            cut = buffer.rfind(" ", 0, MAX_PENDING_CHARS)
+            cut = cut if cut > 0 else MAX_PENDING_CHARS
+            unit = buffer[:cut].strip()
+            if unit:
+                yield unit, self._paragraph
+                self._paragraph = False
+            buffer = buffer[cut:]
+        self._buffer = buffer + held
+
+    def _add(self, unit: str, paragraph: bool) -> Iterator[str]:
+        # Besides the budget, cut where a hash of the previous unit picks an anchor: about once per
+        # third of a window of tokens, and more readily at the end of a long paragraph. Anchors
+        # depend only on the text, so after an edit the boundaries fall back into place at the next
+        # one and later chunks keep their hashes. A quarter window minimum avoids tiny chunks.
+        for text, tokens in _split_long(unit, self.max_tokens):
+            last_hash, last_tokens = self._last
+            weight = self._paragraph_tokens if paragraph else last_tokens
+            anchored = last_hash % self.max_tokens < weight * 3
+            if self._window and (
+                self._window_tokens + tokens > self.max_tokens
+                or (anchored and self._fresh_tokens * 4 >= self.max_tokens)
+            ):
+                yield _join(self._window)
+                # Carry trailing sentences forward as overlap, as long as the new unit still fits.
+                carried: list[tuple[str, int, bool]] = []
+                carried_tokens = 0
+                for item in reversed(self._window[1:]):
+                    if (
+                        carried_tokens + item[1] > self.overlap_tokens
+                        or carried_tokens + item[1] + tokens > self.max_tokens
+                    ):
+                        break
+                    carried.insert(0, item)
+                    carried_tokens += item[1]
+                self._window, self._window_tokens = carried, carried_tokens
+                self._fresh_tokens = 0
+            if paragraph:
+                self._paragraph_tokens = 0
+            self._window.append((text, tokens, paragraph))
+            self._window_tokens += tokens
+            self._fresh_tokens += tokens
+            self._paragraph_tokens += tokens
+            self._last = (zlib.crc32(text.encode("utf-8")), tokens)
+            paragraph = False
+
+
+def iter_chunks(
+    source: str | Iterable[str],
+    max_tokens: int | None = None,
+    overlap_tokens: int | None = None,
+) -> Iterator[str]:
+    chunker = Chunker(max_tokens, overlap_tokens)
+    for piece in [source] if isinstance(source, str) else source:
+        yield from chunker.feed(piece)
+    yield from chunker.finish()
+
+
+async def aiter_chunks(
+    pieces: AsyncIterable[str],
+    max_tokens: int | None = None,
+    overlap_tokens: int | None = None,
+) -> AsyncIterator[str]:
+    chunker = Chunker(max_tokens, overlap_tokens)
+    async for piece in pieces:
+        for chunk in chunker.feed(piece):
+            yield chunk
+    for chunk in chunker.finish():
+        yield chunk
+
+
+def chunk_slice(chunker: Chunker, piece: str, final: bool) -> tuple[Chunker, list[str]]:
+    # Process-pool entry point: chunks one slice and returns the chunker state for the next one.
+    chunks = list(chunker.feed(piece))
+    if final:
+        chunks.extend(chunker.finish())
+    return chunker, chunks
+
+
+def chunk_text(text: str, max_tokens: int | None = None, overlap_tokens: int | None = None) -> list[str]:
+    return list(iter_chunks(text, max_tokens=max_tokens, overlap_tokens=overlap_tokens))
+
+
+def chunk_hash(text: str) -> str:
+    return blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _batched(chunks: Iterable[str], batch_size: int) -> Iterator[list[str]]:
+    batch: list[str] = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_embedding_batches(
+    source: str | Iterable[str],
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+) -> Iterator[list[tuple[str, np.ndarray]]]:
+    for batch in _batched(iter_chunks(source), batch_size):
+        yield list(zip(batch, embed_texts(batch)))
+
+
+def build_embeddings(text: str) -> list[tuple[str, np.ndarray]]:
+    return [item for batch in iter_embedding_batches(text) for item in batch]
+
+
+async def aiter_embedding_batches(
+    text: str,
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    include: Callable[[str], bool] | None = None,
+) -> AsyncIterator[list[tuple[str, np.ndarray]]]:
+    # `include` runs in this process and lets callers skip chunks that need no embedding.
+    if len(text) < settings.cpu_offload_min_chars:
+        chunks = (chunk for chunk in iter_chunks(text) if include is None or include(chunk))
+        for batch in _batched(chunks, batch_size):
+            yield list(zip(batch, embed_texts(batch)))
+        return
+
+    # Chunk in the process pool one OFFLOAD_SLICE_CHARS slice at a time, passing the chunker state
+    # along, and embed full batches on other cores meanwhile. Results are yielded in order with a
+    # bounded number of batches in flight, so nothing scales with the size of the text.
+    chunker = Chunker()
+    in_flight = max(settings.cpu_workers, 1) * 2
+    pending: deque[tuple[list[str], asyncio.Future]] = deque()
+    batch: list[str] = []
+    for start in range(0, len(text), OFFLOAD_SLICE_CHARS):
+        end = start + OFFLOAD_SLICE_CHARS
+        chunker, chunks = await run_cpu_bound(chunk_slice, chunker, text[start:end], end >= len(text))
+        for chunk in chunks:
+            if include is not None and not include(chunk):
+                continue
+            batch.append(chunk)
+            if len(batch) < batch_size:
+                continue
+            pending.append((batch, asyncio.ensure_future(run_cpu_bound(embed_texts, batch))))
+            batch = []
+            if len(pending) >= in_flight:
+                ready, future = pending.popleft()
+                yield list(zip(ready, await future))
+    if batch:
+        pending.append((batch, asyncio.ensure_future(run_cpu_bound(embed_texts, batch))))
+    while pending:
+        ready, future = pending.popleft()
+        yield list(zip(ready, await future))
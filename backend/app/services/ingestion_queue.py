@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+
+from sqlalchemy import delete, func, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.document import Document
+from app.models.document_chunk import DocumentChunk
+from app.models.ingestion_batch import IngestionBatch
+from app.models.ingestion_job import IngestionJob
+from app.services.embedding import pack_embedding, unpack_embeddings
+from app.services.ingestion import aiter_embedding_batches, chunk_hash
+from app.services.job_queue import LeasedJobScheduler
+from app.services.text_index import get_chunk_text_index
+from app.services.vector_index import get_chunk_index
+
+logger = logging.getLogger("smart_qa.ingestion")
+
+
+async def process_ingestion_job(job_id: int) -> None:
+    async with SessionLocal() as session:
+        result = await session.execute(select(IngestionJob).where(IngestionJob.id == job_id))
+        job = result.scalar_one_or_none()
+        if not job:
+            return
+
+        inserted_ids: list[int] = []
+        owner_id = None
+        try:
+            doc_result = await session.execute(select(Document).where(Document.id == job.document_id))
+            document = doc_result.scalar_one_or_none()
+            if not document:
+                _finish(job, "failed", "Document not found")
+                await session.commit()
+                return
+            owner_id = document.owner_id
+
+            # Existing chunks by content hash. Incremental mode reuses every chunk whose text is
+            # unchanged, so only edited chunks are embedded; whatever is left over is stale.
+            existing: dict[str | None, list[int]] = {}
+            existing_result = await session.execute(
+                select(DocumentChunk.id, DocumentChunk.content_hash).where(DocumentChunk.document_id == document.id)
+            )
+            for chunk_id, content_hash in existing_result.all():
+                existing.setdefault(content_hash if job.mode == "incremental" else None, []).append(chunk_id)
+            reused = 0
+
+            def needs_embedding(chunk: str) -> bool:
+                nonlocal reused
+                matches = existing.get(chunk_hash(chunk))
+                if matches:
+                    matches.pop()
+                    reused += 1
+                    return False
+                return True
+
+            job.chunks_processed = 0
+            async for batch in aiter_embedding_batches(
+                document.content,
+                batch_size=settings.ingestion_batch_size,
+                include=needs_embedding,
+            ):
+                rows = [
+                    {
+                        "document_id": document.id,
+                        "owner_id": owner_id,
+                        "content": chunk,
+                        "content_hash": chunk_hash(chunk),
+                        "vector": pack_embedding(embedding),
+                    }
+                    for chunk, embedding in batch
+                ]
+                result = await session.execute(
+                    insert(DocumentChunk).returning(DocumentChunk.id, sort_by_parameter_order=True),
+                    rows,
+                )
+                chunk_ids = list(result.scalars().all())
+                job.chunks_processed += len(chunk_ids)
+                await session.commit()
+                inserted_ids.extend(chunk_ids)
+
+                get_chunk_index(owner_id).add(chunk_ids, unpack_embeddings([row["vector"] for row in rows]))
+                get_chunk_text_index(owner_id).add(chunk_ids, [row["content"] for row in rows])
+
+            stale_ids = [chunk_id for chunk_ids in existing.values() for chunk_id in chunk_ids]
+            await _delete_chunks(session, owner_id, stale_ids)
+            _finish(job, "completed")
+            await session.commit()
+            logger.info(
+                "Ingested document %s: %s new, %s reused, %s removed chunks",
+                document.id,
+                len(inserted_ids),
+                reused,
+                len(stale_ids),
+            )
+        except Exception as exc:  # noqa: BLE001
+            logger.exception("Ingestion failed: %s", exc)
+            await session.rollback()
+            # Batches are committed as they go; drop the partial result so a retry starts clean.
+            if owner_id is not None:
+                await _delete_chunks(session, owner_id, inserted_ids)
+            await session.execute(
+                update(IngestionJob)
+                .where(IngestionJob.id == job_id)
+                .values(status="failed", error=str(exc)[:500], lease_owner=None, lease_expires_at=None)
+            )
+            await session.commit()
+
+
+async def _delete_chunks(session: AsyncSession, owner_id: int, chunk_ids: list[int]) -> None:
+    # Other processes drop these ids when a query finds their rows gone, or at their next index reconcile.
+    for start in range(0, len(chunk_ids), settings.ingestion_batch_size):
+        batch_ids = chunk_ids[start : start + settings.ingestion_batch_size]
+        result = await session.execute(
+            select(DocumentChunk.id, DocumentChunk.content).where(DocumentChunk.id.in_(batch_ids))
+        )
+        rows = result.all()
+        await session.execute(delete(DocumentChunk).where(DocumentChunk.id.in_(batch_ids)))
+        await session.commit()
+        get_chunk_index(owner_id).remove([row[0] for row in rows])
+        get_chunk_text_index(owner_id).remove([row[0] for row in rows], [row[1] for row in rows])
+
+
+def _finish(job: IngestionJob, status: str, error: str | None = None) -> None:
+    job.status = status
+    job.error = error
+    job.lease_owner = None
+    job.lease_expires_at = None
+
+
+class IngestionScheduler(LeasedJobScheduler):
+    # Child jobs of a batch are only claimed while fewer than the batch's max_parallel siblings
+    # hold a live lease, so a large batch leaves workers free for other documents.
+
+    model = IngestionJob
+    name = "ingestion"
+
+    async def process(self, job_id: int) -> None:
+        await process_ingestion_job(job_id)
+
+    def claim_filter(self, now: datetime):
+        sibling = aliased(IngestionJob)
+        running_siblings = (
+            select(func.count())
+            .where(
+                sibling.batch_id == IngestionJob.batch_id,
+                sibling.status == "running",
+                sibling.lease_expires_at >= now,
+            )
+            .scalar_subquery()
+        )
+        batch_limit = select(IngestionBatch.max_parallel).where(IngestionBatch.id == IngestionJob.batch_id).scalar_subquery()
+        return or_(IngestionJob.batch_id.is_(None), running_siblings < batch_limit)
+
+
+_scheduler = IngestionScheduler(
+    workers=settings.ingestion_workers,
+    lease_seconds=settings.ingestion_lease_seconds,
+    poll_seconds=settings.ingestion_poll_seconds,
+    max_attempts=settings.ingestion_max_attempts,
+)
+
+
+def get_ingestion_scheduler() -> IngestionScheduler:
+    return _scheduler
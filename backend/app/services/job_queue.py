@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Any
+from uuid import uuid4
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import SessionLocal
+
+logger = logging.getLogger("smart_qa.jobs")
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive timestamps; they are stored in UTC.
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class LeasedJobScheduler(ABC):
+    # Jobs live in a table with status, attempts, lease_owner and lease_expires_at columns. A
+    # worker claims a job with a conditional UPDATE that sets a lease; the lease is renewed while
+    # the job runs. Pending jobs and jobs whose lease expired (crashed or restarted worker) are
+    # claimable by any process. Subclasses set `model` and implement `process`.
+
+    model: Any
+    name = "job"
+
+    def __init__(
+        self,
+        workers: int,
+        lease_seconds: int,
+        poll_seconds: float,
+        max_attempts: int,
+    ) -> None:
+        self.workers = max(workers, 1)
+        self.lease = timedelta(seconds=lease_seconds)
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup: asyncio.Event | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    @abstractmethod
+    async def process(self, job_id: int) -> None: ...
+
+    def claim_filter(self, now: datetime):
+        # Extra WHERE clause a job must satisfy to be claimed, or None.
+        return None
+
+    async def fail(self, session: AsyncSession, job_id: int, error: str) -> None:
+        await session.execute(
+            update(self.model)
+            .where(self.model.id == job_id)
+            .values(status="failed", error=error, lease_owner=None, lease_expires_at=None)
+        )
+
+    def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and any(not task.done() for task in self._tasks):
+            return
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._tasks = [loop.create_task(self._run()) for _ in range(self.workers)]
+
+    def notify(self) -> None:
+        self.start()
+        self._wakeup.set()
+
+    def notify_later(self, delay: float) -> None:
+        # Wake a worker once a job held back by run_after becomes claimable.
+        self.start()
+        self._loop.call_later(max(delay, 0), lambda: self._wakeup.set())
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self) -> None:
+        while True:
+            # Clear before claiming so a notify that races with the claim is not lost.
+            self._wakeup.clear()
+            try:
+                job_id = await self._claim()
+            except Exception as exc:  # noqa: BLE001
+                logger.exception("Failed to claim %s job: %s", self.name, exc)
+                job_id = None
+            if job_id is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._execute(job_id)
+            except Exception as exc:  # noqa: BLE001
+                logger.exception("%s job %s crashed: %s", self.name.capitalize(), job_id, exc)
+
+    async def _claim(self) -> int | None:
+        model = self.model
+        now = utcnow()
+        claimable = or_(
+            model.status == "pending",
+            and_(
+                model.status == "running",
+                or_(model.lease_expires_at.is_(None), model.lease_expires_at < now),
+            ),
+        )
+        extra = self.claim_filter(now)
+        if extra is not None:
+            claimable = and_(claimable, extra)
+        async with SessionLocal() as session:
+            result = await session.execute(select(model.id).where(claimable).order_by(model.id).limit(self.workers))
+            for job_id in result.scalars().all():
+                claimed = await session.execute(
+                    update(model)
+                    .where(model.id == job_id, claimable)
+                    .values(
+                        status="running",
+                        lease_owner=self.worker_id,
+                        lease_expires_at=now + self.lease,
+                        attempts=model.attempts + 1,
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                await session.commit()
+                if claimed.rowcount == 1:
+                    return job_id
+        return None
+
+    async def _execute(self, job_id: int) -> None:
+        async with SessionLocal() as session:
+            result = await session.execute(select(self.model.attempts).where(self.model.id == job_id))
+            if result.scalar_one() > self.max_attempts:
+                await self.fail(session, job_id, "Exceeded retry attempts")
+                await session.commit()
+                return
+
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            await self.process(job_id)
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, job_id: int) -> None:
+        while True:
+            await asyncio.sleep(self.lease.total_seconds() / 3)
+            try:
+                async with SessionLocal() as session:
+                    renewed = await session.execute(
+                        update(self.model)
+                        .where(self.model.id == job_id, self.model.lease_owner == self.worker_id)
+                        .values(lease_expires_at=utcnow() + self.lease)
+                    )
+                    await session.commit()
+                if renewed.rowcount == 0:
+                    logger.warning("Lost lease on %s job %s", self.name, job_id)
+                    return
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("Failed to renew lease on %s job %s: %s", self.name, job_id, exc)
@@ -1,10 +1,19 @@
 from __future__ import annotations
 
-from typing import Protocol
-
-import httpx
+import json
+from functools import lru_cache
+from typing import AsyncIterator, Protocol
 
 from app.core.config import settings
+from app.services.http_client import get_http_client, provider_timeout
+from app.services.llm_cache import cached_completion
+from app.services.llm_guard import guarded_call, guarded_stream
+
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+COMPLETION_PARAMS = {"temperature": 0.2, "max_tokens": 300}
+SUMMARY_PROMPT = "You summarize a book in 5 concise bullet points."
+REVIEWS_PROMPT = "You produce a rolling consensus of reader sentiment in 3 bullet points."
+ANSWER_PROMPT = "You answer questions using provided context only."
 
 
 class LLMProvider(Protocol):
@@ -12,6 +21,29 @@ class LLMProvider(Protocol):
 
     async def analyze_reviews(self, content: str) -> str: ...
 
+    def stream_summarize(self, content: str) -> AsyncIterator[str]: ...
+
+    async def answer(self, question: str, context: str) -> str: ...
+
+    def stream_answer(self, question: str, context: str) -> AsyncIterator[str]: ...
+
+
+def _summary_prompt(content: str) -> str:
+    return f"Book content:\n{content}\n\nProvide summary:"
+
+
+def _reviews_prompt(content: str) -> str:
+    return f"Reviews:\n{content}\n\nProvide consensus:"
+
+
+def _answer_prompt(question: str, context: str) -> str:
+    return f"Context:\n{context}\n\nQuestion: {question}"
+
+
+async def _stream_words(text: str) -> AsyncIterator[str]:
+    for index, word in enumerate(text.split(" ")):
+        yield word if index == 0 else f" {word}"
+
 
 class MockLLM:
     async def summarize(self, content: str) -> str:
@@ -22,6 +54,17 @@ class MockLLM:
         snippet = content.strip().replace("\n", " ")[:240]
         return f"Consensus (mock): {snippet}"
 
+    async def stream_summarize(self, content: str) -> AsyncIterator[str]:
+        async for word in _stream_words(await self.summarize(content)):
+            yield word
+
+    async def answer(self, question: str, context: str) -> str:
+        return f"Based on the provided documents: {context[:400]}"
+
+    async def stream_answer(self, question: str, context: str) -> AsyncIterator[str]:
+        async for word in _stream_words(await self.answer(question, context)):
+            yield word
+
 
 class OpenRouterLLM:
     def __init__(self, api_key: str, model: str) -> None:
@@ -29,20 +72,19 @@ class OpenRouterLLM:
         self.model = model
 
     async def summarize(self, content: str) -> str:
-        return await _openrouter_call(
-            self.api_key,
-            self.model,
-            system_prompt="You summarize a book in 5 concise bullet points.",
-            user_prompt=f"Book content:\n{content}\n\nProvide summary:",
-        )
+        return await _openrouter_call(self.api_key, self.model, SUMMARY_PROMPT, _summary_prompt(content))
 
     async def analyze_reviews(self, content: str) -> str:
-        return await _openrouter_call(
-            self.api_key,
-            self.model,
-            system_prompt="You produce a rolling consensus of reader sentiment in 3 bullet points.",
-            user_prompt=f"Reviews:\n{content}\n\nProvide consensus:",
-        )
+        return await _openrouter_call(self.api_key, self.model, REVIEWS_PROMPT, _reviews_prompt(content))
+
+    def stream_summarize(self, content: str) -> AsyncIterator[str]:
+        return _openrouter_stream(self.api_key, self.model, SUMMARY_PROMPT, _summary_prompt(content))
+
+    async def answer(self, question: str, context: str) -> str:
+        return await _openrouter_call(self.api_key, self.model, ANSWER_PROMPT, _answer_prompt(question, context))
+
+    def stream_answer(self, question: str, context: str) -> AsyncIterator[str]:
+        return _openrouter_stream(self.api_key, self.model, ANSWER_PROMPT, _answer_prompt(question, context))
 
 
 class HttpLLM:
@@ -51,70 +93,168 @@ class HttpLLM:
         self.api_key = api_key
 
     async def summarize(self, content: str) -> str:
-        return await _openai_compatible_call(
-            self.base_url,
-            self.api_key,
-            system_prompt="You summarize a book in 5 concise bullet points.",
-            user_prompt=f"Book content:\n{content}\n\nProvide summary:",
-        )
+        return await _openai_compatible_call(self.base_url, self.api_key, SUMMARY_PROMPT, _summary_prompt(content))
 
     async def analyze_reviews(self, content: str) -> str:
+        return await _openai_compatible_call(self.base_url, self.api_key, REVIEWS_PROMPT, _reviews_prompt(content))
+
+    def stream_summarize(self, content: str) -> AsyncIterator[str]:
+        return _openai_compatible_stream(self.base_url, self.api_key, SUMMARY_PROMPT, _summary_prompt(content))
+
+    async def answer(self, question: str, context: str) -> str:
         return await _openai_compatible_call(
-            self.base_url,
-            self.api_key,
-            system_prompt="You produce a rolling consensus of reader sentiment in 3 bullet points.",
-            user_prompt=f"Reviews:\n{content}\n\nProvide consensus:",
+            self.base_url, self.api_key, ANSWER_PROMPT, _answer_prompt(question, context)
         )
 
+    def stream_answer(self, question: str, context: str) -> AsyncIterator[str]:
+        return _openai_compatible_stream(
+            self.base_url, self.api_key, ANSWER_PROMPT, _answer_prompt(question, context)
+        )
 
-async def get_llm_provider() -> LLMProvider:
-    if settings.llm_provider == "openrouter" and settings.openrouter_api_key:
-        return OpenRouterLLM(settings.openrouter_api_key, settings.openrouter_model)
-    if settings.llm_provider == "http" and settings.llm_base_url:
-        return HttpLLM(settings.llm_base_url, settings.llm_api_key)
+
+@lru_cache(maxsize=8)
+def _build_provider(
+    provider: str,
+    openrouter_api_key: str | None,
+    openrouter_model: str,
+    base_url: str | None,
+    api_key: str | None,
+) -> LLMProvider:
+    if provider == "openrouter" and openrouter_api_key:
+        return OpenRouterLLM(openrouter_api_key, openrouter_model)
+    if provider == "http" and base_url:
+        return HttpLLM(base_url, api_key)
     return MockLLM()
 
 
-async def _openrouter_call(api_key: str, model: str, system_prompt: str, user_prompt: str) -> str:
-    payload = {
+async def get_llm_provider() -> LLMProvider:
+    # One provider per configuration; providers are stateless and share the pooled HTTP client.
+    return _build_provider(
+        settings.llm_provider,
+        settings.openrouter_api_key,
+        settings.openrouter_model,
+        settings.llm_base_url,
+        settings.llm_api_key,
+    )
+
+
+def _chat_payload(model: str, system_prompt: str, user_prompt: str) -> dict:
+    return {
         "model": model,
         "messages": [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt},
         ],
-        "temperature": 0.2,
-        "max_tokens": 300,
+        **COMPLETION_PARAMS,
     }
 
-    headers = {
+
+def _openrouter_headers(api_key: str) -> dict[str, str]:
+    return {
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json",
     }
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        response = await client.post("https://openrouter.ai/api/v1/chat/completions", json=payload, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-        return data["choices"][0]["message"]["content"].strip()
-
-
-async def _openai_compatible_call(base_url: str, api_key: str | None, system_prompt: str, user_prompt: str) -> str:
-    payload = {
-        "model": "local-llm",
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
-        "temperature": 0.2,
-        "max_tokens": 300,
-    }
 
+def _openai_compatible_headers(api_key: str | None) -> dict[str, str]:
     headers = {"Content-Type": "application/json"}
     if api_key:
         headers["Authorization"] = f"Bearer {api_key}"
+    return headers
+
+
+async def _openrouter_call(api_key: str, model: str, system_prompt: str, user_prompt: str) -> str:
+    return await cached_completion(
+        "openrouter",
+        model,
+        system_prompt,
+        user_prompt,
+        COMPLETION_PARAMS,
+        lambda: guarded_call("openrouter", lambda: _openrouter_request(api_key, model, system_prompt, user_prompt)),
+    )
+
+
+async def _openrouter_request(api_key: str, model: str, system_prompt: str, user_prompt: str) -> str:
+    response = await get_http_client().post(
+        OPENROUTER_URL,
+        json=_chat_payload(model, system_prompt, user_prompt),
+        headers=_openrouter_headers(api_key),
+        timeout=provider_timeout(settings.openrouter_timeout_seconds),
+    )
+    response.raise_for_status()
+    data = response.json()
+    return data["choices"][0]["message"]["content"].strip()
+
+
+def _openrouter_stream(api_key: str, model: str, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+    return guarded_stream(
+        "openrouter",
+        lambda: _stream_chat(
+            OPENROUTER_URL,
+            _openrouter_headers(api_key),
+            _chat_payload(model, system_prompt, user_prompt),
+            settings.openrouter_timeout_seconds,
+        ),
+    )
+
+
+async def _openai_compatible_call(base_url: str, api_key: str | None, system_prompt: str, user_prompt: str) -> str:
+    return await cached_completion(
+        f"http:{base_url}",
+        "local-llm",
+        system_prompt,
+        user_prompt,
+        COMPLETION_PARAMS,
+        lambda: guarded_call(
+            f"http:{base_url}", lambda: _openai_compatible_request(base_url, api_key, system_prompt, user_prompt)
+        ),
+    )
+
+
+async def _openai_compatible_request(base_url: str, api_key: str | None, system_prompt: str, user_prompt: str) -> str:
+    response = await get_http_client().post(
+        f"{base_url}/v1/chat/completions",
+        json=_chat_payload("local-llm", system_prompt, user_prompt),
+        headers=_openai_compatible_headers(api_key),
+        timeout=provider_timeout(settings.llm_timeout_seconds),
+    )
+    response.raise_for_status()
+    data = response.json()
+    return data["choices"][0]["message"]["content"].strip()
+
+
+def _openai_compatible_stream(
+    base_url: str, api_key: str | None, system_prompt: str, user_prompt: str
+) -> AsyncIterator[str]:
+    return guarded_stream(
+        f"http:{base_url}",
+        lambda: _stream_chat(
+            f"{base_url}/v1/chat/completions",
+            _openai_compatible_headers(api_key),
+            _chat_payload("local-llm", system_prompt, user_prompt),
+            settings.llm_timeout_seconds,
+        ),
+    )
+
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        response = await client.post(f"{base_url}/v1/chat/completions", json=payload, headers=headers)
+async def _stream_chat(url: str, headers: dict[str, str], payload: dict, read_timeout: float) -> AsyncIterator[str]:
+    # OpenAI-style streaming: one `data: {json}` server-sent event per delta, ending with
+    # `data: [DONE]`. Comment lines (OpenRouter keep-alives) are skipped. Streamed completions
+    # are not cached.
+    async with get_http_client().stream(
+        "POST",
+        url,
+        json={**payload, "stream": True},
+        headers=headers,
+        timeout=provider_timeout(read_timeout),
+    ) as response:
         response.raise_for_status()
-        data = response.json()
-        return data["choices"][0]["message"]["content"].strip()
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:") :].strip()
+            if data == "[DONE]":
+                break
+            delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+            if delta:
+                yield delta
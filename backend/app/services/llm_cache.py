@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.llm_cache_entry import LLMCacheEntry
+
+logger = logging.getLogger("smart_qa.llm_cache")
+
+PRUNE_EVERY_WRITES = 100
+# Result handed to single-flight waiters when the computing caller is cancelled.
+_LEADER_CANCELLED = object()
+
+
+def cache_key(provider: str, model: str, system_prompt: str, user_prompt: str, params: dict[str, Any]) -> str:
+    payload = json.dumps([provider, model, system_prompt, user_prompt, params], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    # Two tiers: a per-process LRU of recent responses and the llm_cache_entries table shared by
+    # every process. Both honour the TTL; the table is pruned to max_rows, oldest first.
+    # Concurrent misses for the same key wait for a single LLM call.
+
+    def __init__(self, ttl_seconds: int, memory_entries: int, max_rows: int) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.memory_entries = memory_entries
+        self.max_rows = max_rows
+        self._memory: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._writes = 0
+        self.counters = {"memory_hits": 0, "persistent_hits": 0, "misses": 0, "evictions": 0, "errors": 0}
+
+    def stats(self) -> dict[str, Any]:
+        hits = self.counters["memory_hits"] + self.counters["persistent_hits"]
+        lookups = hits + self.counters["misses"]
+        return {
+            **self.counters,
+            "memory_size": len(self._memory),
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+    def clear_memory(self) -> None:
+        self._memory.clear()
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[str]]) -> str:
+        while True:
+            value = self._get_memory(key)
+            if value is not None:
+                self.counters["memory_hits"] += 1
+                return value
+            pending = self._inflight.get(key)
+            if pending is None:
+                return await self._compute(key, compute)
+            value = await asyncio.shield(pending)
+            if value is not _LEADER_CANCELLED:
+                return value
+            # The caller computing this key was cancelled; the first waiter to get here retries.
+
+    async def _compute(self, key: str, compute: Callable[[], Awaitable[str]]) -> str:
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._get_persistent(key)
+            if value is not None:
+                self.counters["persistent_hits"] += 1
+            else:
+                self.counters["misses"] += 1
+                value = await compute()
+                await self._store_persistent(key, value)
+            self._put_memory(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as exc:
+            self._inflight.pop(key, None)
+            if isinstance(exc, asyncio.CancelledError):
+                # Waiters were not cancelled themselves; wake them so one of them takes over.
+                future.set_result(_LEADER_CANCELLED)
+            else:
+                future.set_exception(exc)
+                # Mark the exception as retrieved in case nobody else was waiting for it.
+                future.exception()
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def _get_memory(self, key: str) -> str | None:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires <= time.monotonic():
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return value
+
+    def _put_memory(self, key: str, value: str) -> None:
+        if self.memory_entries <= 0:
+            return
+        self._memory[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    async def _get_persistent(self, key: str) -> str | None:
+        try:
+            async with SessionLocal() as session:
+                result = await session.execute(
+                    select(LLMCacheEntry.response).where(
+                        LLMCacheEntry.key == key, LLMCacheEntry.expires_at > datetime.now(timezone.utc)
+                    )
+                )
+                return result.scalar_one_or_none()
+        except Exception as exc:  # noqa: BLE001
+            # The cache must never fail an LLM call.
+            self.counters["errors"] += 1
+            logger.warning("LLM cache read failed: %s", exc)
+            return None
+
+    async def _store_persistent(self, key: str, value: str) -> None:
+        now = datetime.now(timezone.utc)
+        row = {"key": key, "response": value, "created_at": now, "expires_at": now + timedelta(seconds=self.ttl_seconds)}
+        try:
+            async with SessionLocal() as session:
+                dialect = postgresql if session.bind.dialect.name == "postgresql" else sqlite
+                statement = dialect.insert(LLMCacheEntry).values(**row)
+                statement = statement.on_conflict_do_update(
+                    index_elements=[LLMCacheEntry.key],
+                    set_={"response": value, "created_at": now, "expires_at": row["expires_at"]},
+                )
+                await session.execute(statement)
+                await session.commit()
+                self._writes += 1
+                if self._writes % PRUNE_EVERY_WRITES == 0:
+                    await self._prune(session)
+        except Exception as exc:  # noqa: BLE001
+            self.counters["errors"] += 1
+            logger.warning("LLM cache write failed: %s", exc)
+
+    async def _prune(self, session) -> None:
+        expired = await session.execute(
+            delete(LLMCacheEntry).where(LLMCacheEntry.expires_at <= datetime.now(timezone.utc))
+        )
+        evicted = expired.rowcount
+        total = (await session.execute(select(func.count()).select_from(LLMCacheEntry))).scalar_one()
+        if total > self.max_rows:
+            oldest = select(LLMCacheEntry.key).order_by(LLMCacheEntry.created_at).limit(total - self.max_rows)
+            result = await session.execute(delete(LLMCacheEntry).where(LLMCacheEntry.key.in_(oldest)))
+            evicted += result.rowcount
+        await session.commit()
+        self.counters["evictions"] += evicted
+
+
+_cache = LLMResponseCache(
+    ttl_seconds=settings.llm_cache_ttl_seconds,
+    memory_entries=settings.llm_cache_memory_entries,
+    max_rows=settings.llm_cache_max_rows,
+)
+
+
+def get_llm_cache() -> LLMResponseCache:
+    return _cache
+
+
+async def cached_completion(
+    provider: str,
+    model: str,
+    system_prompt: str,
+    user_prompt: str,
+    params: dict[str, Any],
+    call: Callable[[], Awaitable[str]],
+) -> str:
+    if not settings.llm_cache_enabled:
+        return await call()
+    return await _cache.get_or_compute(cache_key(provider, model, system_prompt, user_prompt, params), call)
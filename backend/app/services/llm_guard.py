@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+import httpx
+
+from app.core.config import settings
+from app.services.llm_scheduler import LLMScheduler, LLMUnavailableError, LLMWork, current_work
+
+logger = logging.getLogger("smart_qa.llm")
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> float:
+        # Returns how long the caller waited for a token. A rate of 0 disables the bucket.
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+
+
+class CircuitBreaker:
+    # closed: everything runs. shedding: background_threshold consecutive failures, interactive
+    # calls keep running and background calls are rejected; once reset_seconds pass without a
+    # failure one background probe at a time is let through. open: failure_threshold consecutive
+    # failures, nothing runs. half_open: reset_seconds after the last failure of an open breaker,
+    # a single probe is let through and its outcome closes or reopens the breaker. Interactive
+    # calls get that probe first; a background call may take it only after a further
+    # reset_seconds without one.
+
+    def __init__(self, failure_threshold: int, background_threshold: int, reset_seconds: float) -> None:
+        self.failure_threshold = max(failure_threshold, 1)
+        self.background_threshold = min(max(background_threshold, 1), self.failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self._last_failure = 0.0
+        self._probing = False
+
+    def _cooled(self, periods: int = 1) -> bool:
+        return time.monotonic() - self._last_failure >= self.reset_seconds * periods
+
+    @property
+    def state(self) -> str:
+        if self.failures < self.background_threshold:
+            return "closed"
+        if self.failures < self.failure_threshold:
+            return "shedding"
+        return "half_open" if self._cooled() else "open"
+
+    def allow(self, background: bool) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "shedding":
+            return not background or (self._cooled() and self._take_probe())
+        if state == "half_open":
+            return (not background or self._cooled(2)) and self._take_probe()
+        return False
+
+    def _take_probe(self) -> bool:
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._last_failure = time.monotonic()
+        self._probing = False
+
+    def release(self) -> None:
+        # The call ended without telling us anything about the provider (cancelled, 4xx).
+        self._probing = False
+
+
+class ProviderLimits:
+    def __init__(self) -> None:
+        self.semaphore = asyncio.Semaphore(max(settings.llm_provider_max_concurrency, 1))
+        self.bucket = TokenBucket(settings.llm_rate_per_second, settings.llm_rate_burst)
+        self.breaker = CircuitBreaker(
+            settings.llm_breaker_failures,
+            settings.llm_breaker_background_failures,
+            settings.llm_breaker_reset_seconds,
+        )
+        self.in_flight = 0
+        self.metrics: dict[str, float] = {
+            "calls": 0,
+            "failures": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "shed_background": 0,
+            "shed_interactive": 0,
+            "throttled_seconds": 0.0,
+        }
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            **self.metrics,
+            "throttled_seconds": round(self.metrics["throttled_seconds"], 3),
+            "in_flight": self.in_flight,
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+        }
+
+
+def _retryable(exc: Exception) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        code = exc.response.status_code
+        return code == 429 or code >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+def _backoff(attempt: int, exc: Exception) -> float:
+    cap = settings.llm_retry_max_seconds
+    if isinstance(exc, httpx.HTTPStatusError):
+        retry_after = exc.response.headers.get("retry-after", "")
+        if retry_after.replace(".", "", 1).isdigit():
+            return min(float(retry_after), cap)
+    # Full jitter, so clients throttled together do not retry together.
+    return random.uniform(0, min(cap, settings.llm_retry_base_seconds * 2**attempt))
+
+
+class LLMGuard:
+    # Wraps provider requests: a global slot from the priority scheduler, a per-provider
+    # concurrency limit and token bucket, retries with jittered exponential backoff on
+    # 429/5xx/transport errors, and a per-provider circuit breaker.
+
+    def __init__(self) -> None:
+        self.scheduler = LLMScheduler(settings.llm_max_concurrency)
+        self._providers: dict[str, ProviderLimits] = {}
+
+    def limits(self, provider: str) -> ProviderLimits:
+        if provider not in self._providers:
+            self._providers[provider] = ProviderLimits()
+        return self._providers[provider]
+
+    async def run(self, provider: str, call: Callable[[], Awaitable[str]]) -> str:
+        work = current_work()
+        limits = self.limits(provider)
+        attempt = 0
+        while True:
+            self._admit(provider, limits, work)
+            try:
+                async with self._slot(limits, work):
+                    result = await call()
+            except LLMUnavailableError:
+                limits.breaker.release()
+                raise
+            except Exception as exc:  # noqa: BLE001
+                await self._retry_or_raise(provider, limits, exc, attempt)
+                attempt += 1
+                continue
+            except BaseException:
+                limits.breaker.release()
+                raise
+            limits.breaker.record_success()
+            limits.metrics["calls"] += 1
+            return result
+
+    async def stream(self, provider: str, call: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        # Like run, but the slot is held until the stream ends. Only failures before the first
+        # chunk are retried; later ones would repeat text the caller already has.
+        work = current_work()
+        limits = self.limits(provider)
+        attempt = 0
+        while True:
+            self._admit(provider, limits, work)
+            started = False
+            try:
+                async with self._slot(limits, work):
+                    async for chunk in call():
+                        started = True
+                        yield chunk
+            except LLMUnavailableError:
+                limits.breaker.release()
+                raise
+            except Exception as exc:  # noqa: BLE001
+                if started:
+                    if _retryable(exc):
+                        limits.breaker.record_failure()
+                        limits.metrics["failures"] += 1
+                    else:
+                        limits.breaker.release()
+                    raise
+                await self._retry_or_raise(provider, limits, exc, attempt)
+                attempt += 1
+                continue
+            except BaseException:
+                limits.breaker.release()
+                raise
+            limits.breaker.record_success()
+            limits.metrics["calls"] += 1
+            return
+
+    def _admit(self, provider: str, limits: ProviderLimits, work: LLMWork) -> None:
+        background = work.priority == "background"
+        if not limits.breaker.allow(background):
+            limits.metrics["shed_background" if background else "shed_interactive"] += 1
+            raise LLMUnavailableError(f"LLM provider {provider} is unavailable ({limits.breaker.state})")
+
+    @asynccontextmanager
+    async def _slot(self, limits: ProviderLimits, work: LLMWork):
+        await self.scheduler.acquire(work)
+        try:
+            async with limits.semaphore:
+                limits.metrics["throttled_seconds"] += await limits.bucket.acquire()
+                limits.in_flight += 1
+                try:
+                    yield
+                finally:
+                    limits.in_flight -= 1
+        finally:
+            self.scheduler.release()
+
+    async def _retry_or_raise(self, provider: str, limits: ProviderLimits, exc: Exception, attempt: int) -> None:
+        if not _retryable(exc):
+            limits.breaker.release()
+            raise exc
+        limits.breaker.record_failure()
+        limits.metrics["failures"] += 1
+        if isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code == 429:
+            limits.metrics["rate_limited"] += 1
+        if attempt >= settings.llm_max_retries:
+            raise exc
+        delay = _backoff(attempt, exc)
+        logger.warning("LLM call to %s failed (%s); retrying in %.1fs", provider, exc, delay)
+        limits.metrics["retries"] += 1
+        await asyncio.sleep(delay)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "scheduler": self.scheduler.stats(),
+            "providers": {name: limits.stats() for name, limits in self._providers.items()},
+        }
+
+
+_guard: LLMGuard | None = None
+_loop: asyncio.AbstractEventLoop | None = None
+
+
+def get_llm_guard() -> LLMGuard:
+    # Semaphores and locks belong to one event loop, so a new loop gets a new guard.
+    global _guard, _loop
+    loop = asyncio.get_running_loop()
+    if _guard is None or _loop is not loop:
+        _guard = LLMGuard()
+        _loop = loop
+    return _guard
+
+
+async def guarded_call(provider: str, call: Callable[[], Awaitable[str]]) -> str:
+    return await get_llm_guard().run(provider, call)
+
+
+def guarded_stream(provider: str, call: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+    return get_llm_guard().stream(provider, call)
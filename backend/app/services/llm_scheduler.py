@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+
+from app.core.config import settings
+
+PRIORITIES = ("interactive", "background")
+
+
+class LLMUnavailableError(RuntimeError):
+    pass
+
+
+class LLMDeadlineExceeded(LLMUnavailableError):
+    pass
+
+
+@dataclass(frozen=True)
+class LLMWork:
+    priority: str = "interactive"
+    # Fairness key: the requesting user for interactive work, the book for pipeline work.
+    key: str = "anonymous"
+
+
+_work: ContextVar[LLMWork] = ContextVar("llm_work", default=LLMWork())
+
+
+@contextmanager
+def llm_work(priority: str, key: Any = None):
+    # Tags every LLM call made inside the block with a priority class and fairness key.
+    token = _work.set(LLMWork(priority, str(key) if key is not None else "anonymous"))
+    try:
+        yield
+    finally:
+        _work.reset(token)
+
+
+def current_work() -> LLMWork:
+    return _work.get()
+
+
+@dataclass
+class _Ticket:
+    future: asyncio.Future
+    deadline: float
+    enqueued: float = field(default_factory=time.monotonic)
+
+
+class LLMScheduler:
+    # Hands out `slots` LLM call slots. Waiting calls are queued per priority class and, within a
+    # class, per fairness key; a freed slot goes to the interactive class first and round-robins
+    # across keys, so one user's burst or one bulk import cannot monopolise the provider. A call
+    # still queued at its deadline is dropped with LLMDeadlineExceeded.
+
+    def __init__(self, slots: int) -> None:
+        self.slots = max(slots, 1)
+        self.active = 0
+        self._queues: dict[str, OrderedDict[str, deque[_Ticket]]] = {name: OrderedDict() for name in PRIORITIES}
+        self.metrics = {
+            name: {"granted": 0, "dropped": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0} for name in PRIORITIES
+        }
+
+    def _deadline_seconds(self, priority: str) -> float:
+        if priority == "background":
+            return settings.llm_background_deadline_seconds
+        return settings.llm_interactive_deadline_seconds
+
+    def _waiting(self) -> bool:
+        return any(self._queues[name] for name in PRIORITIES)
+
+    async def acquire(self, work: LLMWork) -> None:
+        priority = work.priority if work.priority in self._queues else "interactive"
+        if self.active < self.slots and not self._waiting():
+            self.active += 1
+            self._granted(priority, 0.0)
+            return
+
+        ticket = _Ticket(asyncio.get_running_loop().create_future(), time.monotonic() + self._deadline_seconds(priority))
+        self._queues[priority].setdefault(work.key, deque()).append(ticket)
+        try:
+            await asyncio.wait_for(asyncio.shield(ticket.future), timeout=max(ticket.deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            if self._discard(priority, work.key, ticket):
+                self.metrics[priority]["dropped"] += 1
+                raise LLMDeadlineExceeded(f"{priority} LLM call waited past its deadline") from None
+            # Resolved at the same moment the deadline passed: either holds the slot or re-raises.
+            ticket.future.result()
+        except asyncio.CancelledError:
+            if not self._discard(priority, work.key, ticket) and not ticket.future.exception():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        now = time.monotonic()
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            while queue:
+                key, tickets = next(iter(queue.items()))
+                ticket = tickets.popleft()
+                if tickets:
+                    queue.move_to_end(key)
+                else:
+                    del queue[key]
+                if ticket.future.done():
+                    continue
+                if ticket.deadline <= now:
+                    self.metrics[priority]["dropped"] += 1
+                    ticket.future.set_exception(LLMDeadlineExceeded(f"{priority} LLM call waited past its deadline"))
+                    continue
+                self._granted(priority, now - ticket.enqueued)
+                ticket.future.set_result(None)
+                return
+        self.active -= 1
+
+    def _discard(self, priority: str, key: str, ticket: _Ticket) -> bool:
+        # Removes a ticket that was never granted; False if it already holds a slot.
+        if ticket.future.done():
+            return False
+        ticket.future.cancel()
+        tickets = self._queues[priority].get(key)
+        if tickets is not None and ticket in tickets:
+            tickets.remove(ticket)
+            if not tickets:
+                del self._queues[priority][key]
+        return True
+
+    def _granted(self, priority: str, waited: float) -> None:
+        metrics = self.metrics[priority]
+        metrics["granted"] += 1
+        metrics["wait_seconds"] += waited
+        metrics["max_wait_seconds"] = max(metrics["max_wait_seconds"], waited)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "slots": self.slots,
+            "active": self.active,
+            **{
+                name: {
+                    **{metric: round(value, 3) for metric, value in self.metrics[name].items()},
+                    "queued": sum(len(tickets) for tickets in self._queues[name].values()),
+                }
+                for name in PRIORITIES
+            },
+        }
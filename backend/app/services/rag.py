@@ -1,11 +1,115 @@
 from __future__ import annotations
 
+import re
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
 from app.models.document_chunk import DocumentChunk
-from app.services.embedding import cosine_similarity, embed_text
+from app.services.embedding import cosine_similarities, embed_texts, unpack_embeddings
+from app.services.ingestion import TOKEN_PATTERN, count_tokens
+from app.services.text_index import get_chunk_text_index
+from app.services.vector_index import get_chunk_index
+
+RRF_K = 60
+KEYWORD_CANDIDATE_FACTOR = 4
+# A trimmed chunk shorter than this is not worth the prompt space.
+MIN_TRIMMED_TOKENS = 16
+SENTENCE_END_PATTERN = re.compile(r"[.!?](?=\s|$)")
+
+
+def fuse_rankings(rankings: list[list[int]], k: int = RRF_K) -> list[int]:
+    # Reciprocal rank fusion: scale-free, so BM25 and cosine scores need no calibration.
+    scores: dict[int, float] = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.__getitem__, reverse=True)
+
+
+async def retrieve_chunks(
+    session: AsyncSession,
+    question: str,
+    owner_id: int,
+    limit: int = 4,
+    document_ids: list[int] | None = None,
+) -> list[DocumentChunk]:
+    allowed_ids = None
+    if document_ids is not None:
+        allowed_result = await session.execute(
+            select(DocumentChunk.id).where(
+                DocumentChunk.owner_id == owner_id,
+                DocumentChunk.document_id.in_(document_ids),
+            )
+        )
+        allowed_ids = list(allowed_result.scalars().all())
+        if not allowed_ids:
+            return []
+
+    index = get_chunk_index(owner_id)
+    await index.sync(session)
+    query_vector = embed_texts([question])[0]
+    vector_hits = index.search(query_vector, limit=limit * index.rerank_factor, allowed_ids=allowed_ids)
+    vector_ids = [chunk_id for chunk_id, _ in vector_hits]
+
+    keyword_ids: list[int] = []
+    if settings.retrieval_mode == "hybrid":
+        text_index = get_chunk_text_index(owner_id)
+        await text_index.sync(session)
+        keyword_hits = text_index.search(question, limit=limit * KEYWORD_CANDIDATE_FACTOR, allowed_ids=allowed_ids)
+        keyword_ids = [chunk_id for chunk_id, _ in keyword_hits]
+
+    ids = list(dict.fromkeys(vector_ids + keyword_ids))
+    if not ids:
+        return []
+
+    result = await session.execute(select(DocumentChunk).where(DocumentChunk.id.in_(ids)))
+    by_id = {chunk.id: chunk for chunk in result.scalars().all()}
+    stale = [chunk_id for chunk_id in ids if chunk_id not in by_id]
+    if stale:
+        # Deleted by another process since this one indexed them; the next reconcile would catch it too.
+        index.remove(stale)
+        get_chunk_text_index(owner_id).discard(stale)
+    candidates = [by_id[chunk_id] for chunk_id in ids if chunk_id in by_id]
+    if not candidates:
+        return []
+
+    # Exact cosine over the candidate set also re-ranks shortlists from a quantized index.
+    scores = cosine_similarities(query_vector, unpack_embeddings([chunk.vector for chunk in candidates]))
+    vector_ranking = [candidates[idx].id for idx in np.argsort(-scores, kind="stable")]
+    keyword_ranking = [chunk_id for chunk_id in keyword_ids if chunk_id in by_id]
+    ranking = fuse_rankings([vector_ranking, keyword_ranking]) if keyword_ranking else vector_ranking
+    return [by_id[chunk_id] for chunk_id in ranking[:limit]]
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    tokens = list(TOKEN_PATTERN.finditer(text))
+    if len(tokens) <= max_tokens:
+        return text
+    cut = tokens[max_tokens - 1].end() if max_tokens > 0 else 0
+    # Prefer ending on a full sentence if that keeps at least half of the allowance.
+    sentence_ends = [match.end() for match in SENTENCE_END_PATTERN.finditer(text, 0, cut)]
+    if sentence_ends and count_tokens(text[: sentence_ends[-1]]) >= max_tokens // 2:
+        cut = sentence_ends[-1]
+    return text[:cut].rstrip()
 
 
-def select_relevant_chunks(question: str, chunks: list[DocumentChunk], limit: int = 4) -> list[DocumentChunk]:
-    query_vector = embed_text(question)
-    scored = [(cosine_similarity(query_vector, chunk.embedding), chunk) for chunk in chunks]
-    scored.sort(key=lambda item: item[0], reverse=True)
-    return [chunk for _, chunk in scored[:limit]]
+def pack_context(question: str, chunks: list[str], budget_tokens: int | None = None) -> list[str]:
+    # Chunks arrive best-first. Whole chunks are taken while they fit in the budget left after the
+    # question; the first one that does not fit is trimmed into the remainder and the rest are
+    # dropped, so the prompt never outgrows the budget however large the chunks are.
+    budget = (budget_tokens or settings.qa_context_tokens) - count_tokens(question)
+    packed: list[str] = []
+    used = 0
+    for text in dict.fromkeys(chunks):
+        tokens = count_tokens(text)
+        if used + tokens <= budget:
+            packed.append(text)
+            used += tokens
+            continue
+        if budget - used >= MIN_TRIMMED_TOKENS:
+            packed.append(trim_to_tokens(text, budget - used))
+        break
+    return packed
@@ -2,8 +2,10 @@ from __future__ import annotations
 
 from collections import Counter
 
+import numpy as np
+
 from app.models.book import Book
-from app.services.embedding import cosine_similarity, embed_text
+from app.services.embedding import cosine_similarities, embed_texts
 
 
 def recommend_books(books: list[Book], preferences: dict | None = None, limit: int = 5) -> list[Book]:
@@ -35,13 +37,10 @@ def recommend_books(books: list[Book], preferences: dict | None = None, limit: i
 
 
 def recommend_similar_books(target: Book, books: list[Book], limit: int = 5) -> list[Book]:
-    target_vector = embed_text(target.summary or target.title)
-    scored = []
-    for book in books:
-        if book.id == target.id:
-            continue
-        score = cosine_similarity(target_vector, embed_text(book.summary or book.title))
-        scored.append((score, book))
-
-    scored.sort(key=lambda item: item[0], reverse=True)
-    return [book for _, book in scored[:limit]]
+    candidates = [book for book in books if book.id != target.id]
+    if not candidates:
+        return []
+    vectors = embed_texts([target.summary or target.title] + [book.summary or book.title for book in candidates])
+    scores = cosine_similarities(vectors[0], vectors[1:])
+    order = np.argsort(-scores, kind="stable")[:limit]
+    return [candidates[idx] for idx in order]
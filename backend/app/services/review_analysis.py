@@ -1,5 +1,9 @@
 from __future__ import annotations
 
+import asyncio
+
+from app.core.config import settings
+from app.services.ingestion import count_tokens
 from app.services.llm import LLMProvider
 
 
@@ -7,8 +11,55 @@ def build_review_corpus(reviews: list[str]) -> str:
     return "\n".join(reviews)
 
 
+def build_incremental_corpus(previous: str, reviews: list[str]) -> str:
+    return f"Current consensus:\n{previous}\n\nNew reviews:\n{build_review_corpus(reviews)}"
+
+
+def batch_reviews(reviews: list[str], max_tokens: int | None = None) -> list[list[str]]:
+    # Group reviews into prompts of at most max_tokens; a longer review gets a batch of its own.
+    budget = max_tokens or settings.review_summary_batch_tokens
+    batches: list[list[str]] = []
+    current: list[str] = []
+    used = 0
+    for review in reviews:
+        tokens = count_tokens(review)
+        if current and used + tokens > budget:
+            batches.append(current)
+            current, used = [], 0
+        current.append(review)
+        used += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
 async def generate_review_summary(reviews: list[str], llm: LLMProvider) -> str:
+    # Full pass. Map: one consensus per batch of reviews. Reduce: merge groups of consensuses
+    # until one is left.
     if not reviews:
         return ""
-    corpus = build_review_corpus(reviews)
-    return await llm.analyze_reviews(corpus)
+    batches = batch_reviews(reviews)
+    if len(batches) == 1:
+        return await llm.analyze_reviews(build_review_corpus(reviews))
+
+    limiter = asyncio.Semaphore(max(settings.summary_concurrency, 1))
+    fan_in = max(settings.summary_reduce_fan_in, 2)
+
+    async def analyze(content: str) -> str:
+        async with limiter:
+            return await llm.analyze_reviews(content)
+
+    partials = await asyncio.gather(*(analyze(build_review_corpus(batch)) for batch in batches))
+    while len(partials) > 1:
+        groups = ["\n\n".join(partials[start : start + fan_in]) for start in range(0, len(partials), fan_in)]
+        partials = await asyncio.gather(*(analyze(group) for group in groups))
+    return partials[0]
+
+
+async def update_review_summary(previous: str, reviews: list[str], llm: LLMProvider) -> str:
+    # Rolls the consensus forward with only the reviews added since it was written, so the cost
+    # depends on the new reviews and not on how many the book already has.
+    summary = previous
+    for batch in batch_reviews(reviews):
+        summary = await llm.analyze_reviews(build_incremental_corpus(summary, batch))
+    return summary
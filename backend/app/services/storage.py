@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import os
+import shutil
 from pathlib import Path
 from typing import Protocol
 from uuid import uuid4
@@ -9,9 +10,9 @@ from app.core.config import settings
 
 
 class StorageProvider(Protocol):
-    async def save(self, filename: str, content: bytes) -> str: ...
+    async def save_file(self, filename: str, path: Path, key: str | None = None) -> str: ...
 
-    async def read(self, key: str) -> bytes: ...
+    async def download(self, key: str, path: Path) -> None: ...
 
     async def delete(self, key: str) -> None: ...
 
@@ -21,16 +22,13 @@ class LocalStorage:
         self.base_path = Path(base_path)
         self.base_path.mkdir(parents=True, exist_ok=True)
 
-    async def save(self, filename: str, content: bytes) -> str:
-        ext = Path(filename).suffix
-        key = f"{uuid4().hex}{ext}"
-        path = self.base_path / key
-        await _write_bytes(path, content)
+    async def save_file(self, filename: str, path: Path, key: str | None = None) -> str:
+        key = key or f"{uuid4().hex}{Path(filename).suffix}"
+        await _copy_file(path, self.base_path / key)
         return key
 
-    async def read(self, key: str) -> bytes:
-        path = self.base_path / key
-        return await _read_bytes(path)
+    async def download(self, key: str, path: Path) -> None:
+        await _copy_file(self.base_path / key, path)
 
     async def delete(self, key: str) -> None:
         path = self.base_path / key
@@ -45,15 +43,14 @@ class S3Storage:
         self.bucket = bucket
         self.client = boto3.client("s3", endpoint_url=endpoint)
 
-    async def save(self, filename: str, content: bytes) -> str:
-        key = f"{uuid4().hex}-{os.path.basename(filename)}"
-        await _run_blocking(self.client.put_object, Bucket=self.bucket, Key=key, Body=content)
+    async def save_file(self, filename: str, path: Path, key: str | None = None) -> str:
+        key = key or f"{uuid4().hex}-{os.path.basename(filename)}"
+        # upload_file streams the file and switches to multipart uploads for large objects.
+        await _run_blocking(self.client.upload_file, Filename=str(path), Bucket=self.bucket, Key=key)
         return key
 
-    async def read(self, key: str) -> bytes:
-        response = await _run_blocking(self.client.get_object, Bucket=self.bucket, Key=key)
-        body = response["Body"].read()
-        return body
+    async def download(self, key: str, path: Path) -> None:
+        await _run_blocking(self.client.download_file, Bucket=self.bucket, Key=key, Filename=str(path))
 
     async def delete(self, key: str) -> None:
         await _run_blocking(self.client.delete_object, Bucket=self.bucket, Key=key)
@@ -67,16 +64,10 @@ async def get_storage_provider() -> StorageProvider:
     return LocalStorage(settings.storage_local_path)
 
 
-async def _write_bytes(path: Path, content: bytes) -> None:
-    import asyncio
-
-    await asyncio.to_thread(path.write_bytes, content)
-
-
-async def _read_bytes(path: Path) -> bytes:
+async def _copy_file(source: Path, target: Path) -> None:
     import asyncio
 
-    return await asyncio.to_thread(path.read_bytes)
+    await asyncio.to_thread(shutil.copyfile, source, target)
 
 
 async def _delete_file(path: Path) -> None:
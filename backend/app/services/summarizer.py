@@ -1,9 +1,76 @@
 from __future__ import annotations
 
+import asyncio
+from typing import AsyncIterable, AsyncIterator
+
+from app.core.config import settings
+from app.services.ingestion import aiter_chunks, iter_chunks
 from app.services.llm import LLMProvider
 
 
-async def generate_summary(text: str, llm: LLMProvider) -> str:
+async def generate_summary(text: str | AsyncIterable[str], llm: LLMProvider) -> str:
+    if not isinstance(text, str):
+        return await _summarize_pieces(text, llm)
     if not text.strip():
         return ""
-    return await llm.summarize(text)
+    sections = list(iter_chunks(text, max_tokens=settings.summary_section_tokens, overlap_tokens=0))
+    if len(sections) <= 1:
+        return await llm.summarize(text)
+
+    # Map: summarize every section. Reduce: summarize groups of partial summaries until one is
+    # left. Provider calls go through the LLM response cache, so after an edit only the changed
+    # sections and the reduce steps above them reach the LLM.
+    limiter = asyncio.Semaphore(max(settings.summary_concurrency, 1))
+    fan_in = max(settings.summary_reduce_fan_in, 2)
+    summaries = await _reduce(await _summarize_all(sections, llm, limiter), llm, limiter, fan_in, until=1)
+    return summaries[0]
+
+
+async def _summarize_pieces(pieces: AsyncIterable[str], llm: LLMProvider) -> str:
+    # Each section is summarized as soon as the chunker emits it, so the map step runs while later
+    # pages are still being extracted.
+    limiter = asyncio.Semaphore(max(settings.summary_concurrency, 1))
+    tasks: list[asyncio.Future[str]] = []
+    try:
+        async for section in aiter_chunks(pieces, max_tokens=settings.summary_section_tokens, overlap_tokens=0):
+            tasks.append(asyncio.ensure_future(_summarize(section, llm, limiter)))
+        summaries = list(await asyncio.gather(*tasks))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    if not summaries:
+        return ""
+    return (await _reduce(summaries, llm, limiter, max(settings.summary_reduce_fan_in, 2), until=1))[0]
+
+
+async def stream_summary(text: str, llm: LLMProvider) -> AsyncIterator[str]:
+    # Same map-reduce as generate_summary, but the final merge is streamed from the provider.
+    if not text.strip():
+        return
+    sections = list(iter_chunks(text, max_tokens=settings.summary_section_tokens, overlap_tokens=0))
+    if len(sections) > 1:
+        limiter = asyncio.Semaphore(max(settings.summary_concurrency, 1))
+        fan_in = max(settings.summary_reduce_fan_in, 2)
+        summaries = await _reduce(await _summarize_all(sections, llm, limiter), llm, limiter, fan_in, until=fan_in)
+        text = "\n\n".join(summaries)
+    async for chunk in llm.stream_summarize(text):
+        yield chunk
+
+
+async def _reduce(
+    summaries: list[str], llm: LLMProvider, limiter: asyncio.Semaphore, fan_in: int, until: int
+) -> list[str]:
+    while len(summaries) > until:
+        groups = ["\n\n".join(summaries[start : start + fan_in]) for start in range(0, len(summaries), fan_in)]
+        summaries = await _summarize_all(groups, llm, limiter)
+    return summaries
+
+
+async def _summarize(text: str, llm: LLMProvider, limiter: asyncio.Semaphore) -> str:
+    async with limiter:
+        return await llm.summarize(text)
+
+
+async def _summarize_all(texts: list[str], llm: LLMProvider, limiter: asyncio.Semaphore) -> list[str]:
+    return list(await asyncio.gather(*(_summarize(text, llm, limiter) for text in texts)))
@@ -1,19 +1,69 @@
 from __future__ import annotations
 
-from io import BytesIO
+import asyncio
+from collections import deque
+from collections.abc import AsyncIterator
+from pathlib import Path
 from typing import Tuple
 
+from app.core.config import settings
+from app.services.compute import run_cpu_bound
 
-def extract_text(filename: str, content: bytes) -> Tuple[str, str]:
-    lower = filename.lower()
-    if lower.endswith(".pdf"):
-        return _extract_pdf_text(content), "application/pdf"
-    return content.decode("utf-8", errors="ignore"), "text/plain"
 
+def content_type_for(filename: str) -> str:
+    return "application/pdf" if filename.lower().endswith(".pdf") else "text/plain"
 
-def _extract_pdf_text(content: bytes) -> str:
+
+async def extract_file_text_async(filename: str, path: str | Path) -> Tuple[str, str]:
+    pieces = [piece async for piece in iter_file_text(filename, path)]
+    return "".join(pieces), content_type_for(filename)
+
+
+async def iter_file_text(filename: str, path: str | Path) -> AsyncIterator[str]:
+    # Yields pieces whose concatenation is the whole text, so consumers can start on the first
+    # pages of a large PDF while later ranges are still being parsed.
+    if filename.lower().endswith(".pdf"):
+        first = True
+        async for page in iter_pdf_pages(path):
+            yield page if first else "\n" + page
+            first = False
+        return
+    handle = await asyncio.to_thread(open, path, encoding="utf-8", errors="ignore")
+    try:
+        while piece := await asyncio.to_thread(handle.read, settings.upload_chunk_bytes):
+            yield piece
+    finally:
+        handle.close()
+
+
+async def iter_pdf_pages(path: str | Path) -> AsyncIterator[str]:
+    # Page ranges are parsed in the process pool with a bounded number in flight; pages are
+    # yielded in order. Only the path crosses the process boundary.
+    path = str(path)
+    step = max(settings.pdf_pages_per_task, 1)
+    total, pages = await run_cpu_bound(_extract_pdf_range, path, 0, step)
+    for page in pages:
+        yield page
+
+    in_flight = max(settings.cpu_workers, 1) * 2
+    pending: deque[asyncio.Future] = deque()
+    try:
+        for start in range(step, total, step):
+            pending.append(asyncio.ensure_future(run_cpu_bound(_extract_pdf_range, path, start, start + step)))
+            if len(pending) >= in_flight:
+                for page in (await pending.popleft())[1]:
+                    yield page
+        while pending:
+            for page in (await pending.popleft())[1]:
+                yield page
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _extract_pdf_range(path: str, start: int, end: int) -> tuple[int, list[str]]:
     from pypdf import PdfReader
 
-    reader = PdfReader(BytesIO(content))
-    pages = [page.extract_text() or "" for page in reader.pages]
-    return "\n".join(pages)
+    reader = PdfReader(path)
+    total = len(reader.pages)
+    return total, [reader.pages[index].extract_text() or "" for index in range(start, min(end, total))]
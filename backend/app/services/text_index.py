@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import math
+import time
+from array import array
+from collections import Counter
+from itertools import groupby
+from operator import itemgetter
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.document_chunk import DocumentChunk
+from app.services.embedding import tokenize
+from app.services.vector_index import SYNC_FETCH_ROWS
+
+
+class _Postings:
+    __slots__ = ("ids", "tfs", "lengths")
+
+    def __init__(self) -> None:
+        self.ids = array("q")
+        self.tfs = array("I")
+        self.lengths = array("I")
+
+
+class InvertedIndex:
+    def __init__(self, owner_id: int | None = None, k1: float = 1.2, b: float = 0.75) -> None:
+        self.owner_id = owner_id
+        self.k1 = k1
+        self.b = b
+        self._postings: dict[str, _Postings] = {}
+        # Every indexed chunk id with its token count (0 for chunks without terms).
+        self._doc_ids = array("q")
+        self._doc_lengths = array("I")
+        self._doc_count = 0
+        self._total_length = 0
+        self.last_id = 0
+        self._reconcile_at = 0.0
+
+    def __len__(self) -> int:
+        return self._doc_count
+
+    def document_frequency(self, term: str) -> int:
+        postings = self._postings.get(term)
+        return len(postings.ids) if postings else 0
+
+    def add(self, ids: list[int], texts: list[str]) -> None:
+        known = self._indexed([chunk_id for chunk_id in ids if chunk_id <= self.last_id])
+        for chunk_id, text in zip(ids, texts):
+            self.last_id = max(self.last_id, chunk_id)
+            if chunk_id in known:
+                continue
+            known.add(chunk_id)
+            terms = Counter(tokenize(text))
+            length = sum(terms.values())
+            self._doc_ids.append(chunk_id)
+            self._doc_lengths.append(length)
+            if not terms:
+                continue
+            for term, tf in terms.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = _Postings()
+                postings.ids.append(chunk_id)
+                postings.tfs.append(tf)
+                postings.lengths.append(length)
+            self._doc_count += 1
+            self._total_length += length
+
+    def remove(self, ids: list[int], texts: list[str]) -> None:
+        for chunk_id, text in zip(ids, texts):
+            position = _find(self._doc_ids, chunk_id)
+            if position is None:
+                continue
+            length = self._doc_lengths[position]
+            del self._doc_ids[position]
+            del self._doc_lengths[position]
+            for term in set(tokenize(text)):
+                postings = self._postings.get(term)
+                position = _find(postings.ids, chunk_id) if postings else None
+                if position is None:
+                    continue
+                del postings.ids[position]
+                del postings.tfs[position]
+                del postings.lengths[position]
+                if not postings.ids:
+                    del self._postings[term]
+            if length:
+                self._doc_count -= 1
+                self._total_length -= length
+
+    def discard(self, ids: list[int]) -> None:
+        # Removes chunks whose text is gone (deleted by another process) by scanning every posting list.
+        if not ids or not self._doc_ids:
+            return
+        drop = np.asarray(ids, dtype=np.int64)
+        mask = np.isin(np.frombuffer(self._doc_ids, dtype=np.int64), drop)
+        if not mask.any():
+            return
+        lengths = np.frombuffer(self._doc_lengths, dtype=np.uint32)[mask]
+        self._doc_count -= int(np.count_nonzero(lengths))
+        self._total_length -= int(lengths.sum())
+        self._doc_ids = _filtered(self._doc_ids, ~mask)
+        self._doc_lengths = _filtered(self._doc_lengths, ~mask)
+        for term in list(self._postings):
+            postings = self._postings[term]
+            keep = ~np.isin(np.frombuffer(postings.ids, dtype=np.int64), drop)
+            if keep.all():
+                continue
+            if not keep.any():
+                del self._postings[term]
+                continue
+            postings.ids = _filtered(postings.ids, keep)
+            postings.tfs = _filtered(postings.tfs, keep)
+            postings.lengths = _filtered(postings.lengths, keep)
+
+    def search(self, query: str, limit: int = 20, allowed_ids=None) -> list[tuple[int, float]]:
+        terms = [term for term in set(tokenize(query)) if term in self._postings]
+        if not terms or limit <= 0:
+            return []
+
+        avg_length = self._total_length / self._doc_count
+        ids_parts = []
+        score_parts = []
+        for term in terms:
+            postings = self._postings[term]
+            ids = np.frombuffer(postings.ids, dtype=np.int64)
+            tfs = np.frombuffer(postings.tfs, dtype=np.uint32).astype(np.float32)
+            lengths = np.frombuffer(postings.lengths, dtype=np.uint32).astype(np.float32)
+            df = len(ids)
+            idf = math.log(1.0 + (self._doc_count - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * lengths / avg_length)
+            ids_parts.append(ids)
+            score_parts.append(idf * tfs * (self.k1 + 1.0) / (tfs + norm))
+
+        unique_ids, inverse = np.unique(np.concatenate(ids_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+        if allowed_ids is not None:
+            keep = np.isin(unique_ids, np.asarray(allowed_ids, dtype=np.int64))
+            unique_ids, scores = unique_ids[keep], scores[keep]
+            if not len(unique_ids):
+                return []
+        limit = min(limit, len(unique_ids))
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(unique_ids[idx]), float(scores[idx])) for idx in top]
+
+    async def sync(self, session: AsyncSession) -> None:
+        # Like VectorIndex.sync: recheck a trailing id window for rows committed out of id order,
+        # and compare every id each INDEX_RECONCILE_SECONDS, dropping chunks deleted elsewhere.
+        statement = select(DocumentChunk.id)
+        if self.owner_id is not None:
+            statement = statement.where(DocumentChunk.owner_id == self.owner_id)
+        reconcile = time.monotonic() >= self._reconcile_at
+        if reconcile:
+            self._reconcile_at = time.monotonic() + settings.index_reconcile_seconds
+        else:
+            statement = statement.where(DocumentChunk.id > self.last_id - settings.index_sync_overlap_ids)
+        present = np.frombuffer(self._doc_ids, dtype=np.int64).copy()
+        result = await session.execute(statement)
+        ids = list(result.scalars().all())
+        if reconcile:
+            self.discard(present[~np.isin(present, np.asarray(ids, dtype=np.int64))].tolist())
+        known = self._indexed(ids)
+        missing = [chunk_id for chunk_id in ids if chunk_id not in known]
+        for start in range(0, len(missing), SYNC_FETCH_ROWS):
+            result = await session.execute(
+                select(DocumentChunk.id, DocumentChunk.content)
+                .where(DocumentChunk.id.in_(missing[start : start + SYNC_FETCH_ROWS]))
+                .order_by(DocumentChunk.id)
+            )
+            rows = result.all()
+            self.add([row[0] for row in rows], [row[1] for row in rows])
+
+    def _indexed(self, ids: list[int]) -> set[int]:
+        if not ids or not self._doc_ids:
+            return set()
+        ids_array = np.asarray(ids, dtype=np.int64)
+        return set(ids_array[np.isin(ids_array, np.frombuffer(self._doc_ids, dtype=np.int64))].tolist())
+
+
+def _find(ids: array, chunk_id: int) -> int | None:
+    # The NumPy view must be released before the caller resizes the array.
+    matches = np.flatnonzero(np.frombuffer(ids, dtype=np.int64) == chunk_id)
+    return int(matches[0]) if len(matches) else None
+
+
+def _filtered(values: array, keep: np.ndarray) -> array:
+    filtered = array(values.typecode)
+    filtered.frombytes(np.frombuffer(values, dtype=np.dtype(values.typecode))[keep].tobytes())
+    return filtered
+
+
+_chunk_text_indexes: dict[int, InvertedIndex] = {}
+
+
+def get_chunk_text_index(owner_id: int) -> InvertedIndex:
+    index = _chunk_text_indexes.get(owner_id)
+    if index is None:
+        index = _chunk_text_indexes[owner_id] = InvertedIndex(owner_id=owner_id)
+    return index
+
+
+async def load_chunk_text_indexes(session: AsyncSession) -> None:
+    # Streamed in slices so startup never holds the text of the whole corpus at once.
+    result = await session.stream(
+        select(DocumentChunk.owner_id, DocumentChunk.id, DocumentChunk.content)
+        .where(DocumentChunk.owner_id.is_not(None))
+        .order_by(DocumentChunk.owner_id, DocumentChunk.id)
+        .execution_options(yield_per=SYNC_FETCH_ROWS)
+    )
+    async for partition in result.partitions():
+        for owner_id, rows in groupby(partition, key=itemgetter(0)):
+            rows = list(rows)
+            get_chunk_text_index(owner_id).add([row[1] for row in rows], [row[2] for row in rows])
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import tempfile
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+# Room for multipart boundaries, part headers and the small form fields sent next to the file.
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadTooLargeError(ValueError):
+    def __init__(self, max_bytes: int) -> None:
+        super().__init__(f"Upload exceeds the {max_bytes} byte limit")
+        self.max_bytes = max_bytes
+
+
+class UploadLimitMiddleware:
+    # Caps multipart bodies before the form parser buffers them: a Content-Length over the limit is
+    # rejected before any of the body is read, and a chunked body is cut off as soon as it passes it.
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        headers = dict(scope.get("headers") or []) if scope["type"] == "http" else {}
+        if not headers.get(b"content-type", b"").startswith(b"multipart/form-data"):
+            await self.app(scope, receive, send)
+            return
+        max_bytes = settings.max_upload_bytes
+        limit = max_bytes + FORM_OVERHEAD_BYTES
+        length = headers.get(b"content-length", b"")
+        if length.isdigit() and int(length) > limit:
+            response = JSONResponse(status_code=413, content={"error_message": str(UploadTooLargeError(max_bytes))})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # An HTTPException, because FastAPI turns other errors while parsing a form into a 400.
+                    raise HTTPException(status_code=413, detail=str(UploadTooLargeError(max_bytes)))
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+@dataclass(frozen=True)
+class SpooledUpload:
+    filename: str
+    path: Path
+    size: int
+    sha256: str
+
+
+def _spool(source: BinaryIO, max_bytes: int, chunk_bytes: int) -> tuple[Path, int, str]:
+    digest = hashlib.sha256()
+    size = 0
+    fd, name = tempfile.mkstemp(prefix="upload-", dir=settings.upload_spool_dir)
+    path = Path(name)
+    try:
+        with os.fdopen(fd, "wb") as target:
+            while chunk := source.read(chunk_bytes):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLargeError(max_bytes)
+                digest.update(chunk)
+                target.write(chunk)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    return path, size, digest.hexdigest()
+
+
+@asynccontextmanager
+async def spool_upload(file: UploadFile, max_bytes: int | None = None) -> AsyncIterator[SpooledUpload]:
+    # Copies the upload to a temp file one fixed-size buffer at a time, hashing and counting in the
+    # same pass. UploadLimitMiddleware has already bounded what the form parser could buffer. The
+    # file is removed when the block exits.
+    max_bytes = max_bytes or settings.max_upload_bytes
+    if file.size is not None and file.size > max_bytes:
+        raise UploadTooLargeError(max_bytes)
+    await file.seek(0)
+    path, size, sha256 = await asyncio.to_thread(_spool, file.file, max_bytes, settings.upload_chunk_bytes)
+    try:
+        yield SpooledUpload(filename=file.filename or "", path=path, size=size, sha256=sha256)
+    finally:
+        await asyncio.to_thread(path.unlink, missing_ok=True)
+
+
+@asynccontextmanager
+async def spooled_download(storage, key: str) -> AsyncIterator[Path]:
+    # Streams a stored object to a temp file for the duration of the block.
+    fd, name = tempfile.mkstemp(prefix="download-", dir=settings.upload_spool_dir)
+    os.close(fd)
+    path = Path(name)
+    try:
+        await storage.download(key, path)
+        yield path
+    finally:
+        await asyncio.to_thread(path.unlink, missing_ok=True)
@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import time
+from itertools import groupby
+from operator import itemgetter
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.document_chunk import DocumentChunk
+from app.services.embedding import EMBEDDING_SIZE, unpack_embeddings
+
+SCORE_BLOCK_ROWS = 65536
+SYNC_FETCH_ROWS = 1000
+
+
+class VectorIndex:
+    rerank_factor = 1
+
+    def __init__(self, dim: int = EMBEDDING_SIZE, owner_id: int | None = None) -> None:
+        self.dim = dim
+        self.owner_id = owner_id
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._size = 0
+        self._allocate(0)
+        self.last_id = 0
+        self._reconcile_at = 0.0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, ids: list[int], vectors) -> None:
+        if not len(ids):
+            return
+        ids_array = np.asarray(ids, dtype=np.int64)
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(ids_array), self.dim)
+        if self._size and ids_array.min() <= self.last_id:
+            # Ingestion and sync can both deliver the same rows; keep the first copy.
+            fresh = ~np.isin(ids_array, self._ids[: self._size])
+            ids_array, matrix = ids_array[fresh], matrix[fresh]
+            if not len(ids_array):
+                return
+        self._reserve(self._size + len(ids_array))
+        end = self._size + len(ids_array)
+        self._ids[self._size : end] = ids_array
+        self._write(self._size, end, matrix)
+        self._size = end
+        self.last_id = max(self.last_id, int(ids_array.max()))
+
+    def search(self, query, limit: int = 4, allowed_ids=None) -> list[tuple[int, float]]:
+        if self._size == 0 or limit <= 0:
+            return []
+        scores = self._scores(np.asarray(query, dtype=np.float32))
+        available = self._size
+        if allowed_ids is not None:
+            mask = np.isin(self._ids[: self._size], np.asarray(allowed_ids, dtype=np.int64))
+            available = int(mask.sum())
+            if not available:
+                return []
+            scores[~mask] = -np.inf
+        limit = min(limit, available)
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(self._ids[idx]), float(scores[idx])) for idx in top]
+
+    def remove(self, ids: list[int]) -> None:
+        if not self._size or not len(ids):
+            return
+        keep = ~np.isin(self._ids[: self._size], np.asarray(ids, dtype=np.int64))
+        kept = int(keep.sum())
+        if kept == self._size:
+            return
+        self._ids[:kept] = self._ids[: self._size][keep]
+        self._compact(keep, kept)
+        self._size = kept
+
+    async def sync(self, session: AsyncSession) -> None:
+        # Ids are assigned before commit, so with concurrent writers a row can become visible after
+        # a higher id was synced. Each sync rechecks the ids of a trailing window below last_id, and
+        # every INDEX_RECONCILE_SECONDS all ids are compared, which catches rows committed later still
+        # and chunks deleted by other processes.
+        statement = select(DocumentChunk.id).where(DocumentChunk.vector.is_not(None))
+        if self.owner_id is not None:
+            statement = statement.where(DocumentChunk.owner_id == self.owner_id)
+        floor = None
+        if time.monotonic() < self._reconcile_at:
+            floor = self.last_id - settings.index_sync_overlap_ids
+            statement = statement.where(DocumentChunk.id > floor)
+        else:
+            self._reconcile_at = time.monotonic() + settings.index_reconcile_seconds
+        # Taken before the query: rows indexed after it started may be missing from its result.
+        present = self._ids[: self._size].copy()
+        result = await session.execute(statement)
+        ids = np.asarray(result.scalars().all(), dtype=np.int64)
+        if floor is None:
+            # A full reconcile also drops chunks deleted by other processes.
+            self.remove(present[~np.isin(present, ids)])
+        else:
+            present = present[present > floor]
+        missing = ids[~np.isin(ids, present)]
+        for start in range(0, len(missing), SYNC_FETCH_ROWS):
+            batch_ids = missing[start : start + SYNC_FETCH_ROWS].tolist()
+            result = await session.execute(
+                select(DocumentChunk.id, DocumentChunk.vector)
+                .where(DocumentChunk.id.in_(batch_ids))
+                .order_by(DocumentChunk.id)
+            )
+            rows = result.all()
+            if rows:
+                self.add([row[0] for row in rows], unpack_embeddings([row[1] for row in rows]))
+
+    def _allocate(self, capacity: int) -> None:
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        if self._size:
+            vectors[: self._size] = self._vectors[: self._size]
+        self._vectors = vectors
+
+    def _write(self, start: int, end: int, matrix: np.ndarray) -> None:
+        self._vectors[start:end] = matrix
+
+    def _compact(self, keep: np.ndarray, kept: int) -> None:
+        self._vectors[:kept] = self._vectors[: self._size][keep]
+
+    def _scores(self, query: np.ndarray) -> np.ndarray:
+        return self._vectors[: self._size] @ query
+
+    def _reserve(self, capacity: int) -> None:
+        if capacity <= len(self._ids):
+            return
+        new_capacity = max(capacity, 2 * len(self._ids), 64)
+        ids = np.zeros(new_capacity, dtype=np.int64)
+        ids[: self._size] = self._ids[: self._size]
+        self._ids = ids
+        self._allocate(new_capacity)
+
+
+# Int8 codes with one float32 scale per vector: roughly a quarter of the float32 footprint.
+# Scores are approximate, so callers fetch `limit * rerank_factor` candidates and re-rank
+# them with the exact stored vectors (see app.services.rag.retrieve_chunks).
+class QuantizedVectorIndex(VectorIndex):
+    def __init__(self, dim: int = EMBEDDING_SIZE, owner_id: int | None = None, rerank_factor: int = 8) -> None:
+        self.rerank_factor = max(rerank_factor, 1)
+        super().__init__(dim, owner_id)
+
+    def _allocate(self, capacity: int) -> None:
+        codes = np.zeros((capacity, self.dim), dtype=np.int8)
+        scales = np.zeros(capacity, dtype=np.float32)
+        if self._size:
+            codes[: self._size] = self._codes[: self._size]
+            scales[: self._size] = self._scales[: self._size]
+        self._codes = codes
+        self._scales = scales
+
+    def _write(self, start: int, end: int, matrix: np.ndarray) -> None:
+        codes, scales = quantize_int8(matrix)
+        self._codes[start:end] = codes
+        self._scales[start:end] = scales
+
+    def _compact(self, keep: np.ndarray, kept: int) -> None:
+        self._codes[:kept] = self._codes[: self._size][keep]
+        self._scales[:kept] = self._scales[: self._size][keep]
+
+    def _scores(self, query: np.ndarray) -> np.ndarray:
+        scores = np.empty(self._size, dtype=np.float32)
+        # Dequantize in blocks so a query never materializes the whole float matrix.
+        for start in range(0, self._size, SCORE_BLOCK_ROWS):
+            end = min(start + SCORE_BLOCK_ROWS, self._size)
+            scores[start:end] = (self._codes[start:end].astype(np.float32) @ query) * self._scales[start:end]
+        return scores
+
+
+def quantize_int8(matrix: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def measure_recall(vectors, queries, limit: int = 4, rerank_factor: int = 8) -> float:
+    # Fraction of the exact top-`limit` ids recovered by int8 search plus exact re-ranking.
+    vectors = np.asarray(vectors, dtype=np.float32)
+    queries = np.asarray(queries, dtype=np.float32)
+    if not len(vectors) or not len(queries):
+        return 1.0
+    ids = np.arange(len(vectors))
+    exact = VectorIndex(vectors.shape[1])
+    exact.add(ids, vectors)
+    quantized = QuantizedVectorIndex(vectors.shape[1], rerank_factor=rerank_factor)
+    quantized.add(ids, vectors)
+
+    found = 0
+    expected = 0
+    for query in queries:
+        truth = {idx for idx, _ in exact.search(query, limit)}
+        shortlist = np.asarray([idx for idx, _ in quantized.search(query, limit * rerank_factor)])
+        reranked = shortlist[np.argsort(-(vectors[shortlist] @ query), kind="stable")[:limit]]
+        found += len(truth.intersection(reranked.tolist()))
+        expected += len(truth)
+    return found / expected if expected else 1.0
+
+
+def _build_chunk_index(owner_id: int) -> VectorIndex:
+    if settings.vector_index_quantization == "int8":
+        return QuantizedVectorIndex(owner_id=owner_id, rerank_factor=settings.vector_index_rerank_factor)
+    return VectorIndex(owner_id=owner_id)
+
+
+# One shard per document owner, so a query only scores the caller's own chunks.
+_chunk_indexes: dict[int, VectorIndex] = {}
+
+
+def get_chunk_index(owner_id: int) -> VectorIndex:
+    index = _chunk_indexes.get(owner_id)
+    if index is None:
+        index = _chunk_indexes[owner_id] = _build_chunk_index(owner_id)
+    return index
+
+
+async def load_chunk_indexes(session: AsyncSession) -> None:
+    result = await session.stream(
+        select(DocumentChunk.owner_id, DocumentChunk.id, DocumentChunk.vector)
+        .where(DocumentChunk.owner_id.is_not(None), DocumentChunk.vector.is_not(None))
+        .order_by(DocumentChunk.owner_id, DocumentChunk.id)
+        .execution_options(yield_per=SYNC_FETCH_ROWS)
+    )
+    async for partition in result.partitions():
+        for owner_id, rows in groupby(partition, key=itemgetter(0)):
+            rows = list(rows)
+            get_chunk_index(owner_id).add([row[1] for row in rows], unpack_embeddings([row[2] for row in rows]))
@@ -2,6 +2,7 @@ import importlib
 import os
 from pathlib import Path
 
+import httpx
 import pytest
 from httpx import ASGITransport, AsyncClient
 
@@ -16,7 +17,9 @@ import app.db.session  # noqa: E402
 importlib.reload(app.core.config)
 importlib.reload(app.db.session)
 
+from app.api import deps  # noqa: E402
 from app.main import app, init_models  # noqa: E402
+from app.services import book_pipeline, http_client  # noqa: E402
 
 
 @pytest.fixture(scope="session", autouse=True)
@@ -33,3 +36,49 @@ async def client():
     transport = ASGITransport(app=app)
     async with AsyncClient(transport=transport, base_url="http://test") as ac:
         yield ac
+
+
+class RecordingLLM:
+    def __init__(self):
+        self.calls = []
+
+    async def analyze_reviews(self, content: str) -> str:
+        self.calls.append(content)
+        return f"Consensus {len(self.calls)}"
+
+    async def answer(self, question: str, context: str) -> str:
+        self.calls.append(question)
+        return f"Answer to {question} from {len(context)} chars"
+
+
+@pytest.fixture()
+def recording_llm(monkeypatch):
+    # Stands in for the configured provider in the API and the book pipeline.
+    llm = RecordingLLM()
+
+    async def get_recording_llm():
+        return llm
+
+    monkeypatch.setattr(deps, "get_llm_provider", get_recording_llm)
+    monkeypatch.setattr(book_pipeline, "get_llm_provider", get_recording_llm)
+    return llm
+
+
+@pytest.fixture()
+async def mock_http_client(monkeypatch):
+    # Call with a request handler to route the shared HTTP client through it; returns the list of
+    # clients built since.
+    clients = []
+
+    async def install(handler):
+        await http_client.close_http_client()
+
+        def build_client() -> httpx.AsyncClient:
+            clients.append(httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+            return clients[-1]
+
+        monkeypatch.setattr(http_client, "_build_client", build_client)
+        return clients
+
+    yield install
+    await http_client.close_http_client()
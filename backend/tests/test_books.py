@@ -1,4 +1,16 @@
+import asyncio
+import hashlib
+from pathlib import Path
+
 import pytest
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.stored_file import StoredFile
+from app.services.file_store import acquire_stored_file, release_stored_file
+from app.services.storage import LocalStorage
+from app.services.uploads import SpooledUpload
 
 
 async def get_token(client, email="booker@test.com", password="Password123!"):
@@ -82,3 +94,79 @@ async def test_book_crud(client):
 
     response = await client.delete(f"/api/v1/books/{book_id}", headers=headers)
     assert response.status_code == 204
+
+
+@pytest.mark.asyncio
+async def test_duplicate_uploads_share_one_stored_object(client):
+    headers = {"Authorization": f"Bearer {await get_token(client, email='dedup@test.com')}"}
+    content = b"Identical bytes uploaded twice for deduplication."
+    book_ids = []
+    for title in ("First Copy", "Second Copy"):
+        response = await client.post(
+            "/api/v1/books",
+            data={"title": title, "author": "Author", "genre": "Drama", "year_published": "2020"},
+            files={"file": ("dup.txt", content, "text/plain")},
+            headers=headers,
+        )
+        book_ids.append(response.json()["data"]["id"])
+
+    async with SessionLocal() as session:
+        result = await session.execute(select(StoredFile).where(StoredFile.size == len(content)))
+        stored = result.scalar_one()
+    assert stored.ref_count == 2
+    path = Path(settings.storage_local_path) / stored.storage_key
+    assert path.read_bytes() == content
+
+    await client.delete(f"/api/v1/books/{book_ids[0]}", headers=headers)
+    assert path.exists()
+    await client.delete(f"/api/v1/books/{book_ids[1]}", headers=headers)
+    assert not path.exists()
+
+
+@pytest.mark.asyncio
+async def test_stored_file_reference_rolls_back_with_the_caller(tmp_path):
+    storage = LocalStorage(str(tmp_path / "objects"))
+    content = b"Bytes whose book insert fails after the file is stored."
+    source = tmp_path / "upload.txt"
+    source.write_bytes(content)
+    upload = SpooledUpload("upload.txt", source, len(content), hashlib.sha256(content).hexdigest())
+
+    async with SessionLocal() as session:
+        key = await acquire_stored_file(session, storage, upload)
+        await session.commit()
+    async with SessionLocal() as session:
+        assert await acquire_stored_file(session, storage, upload) == key
+        await session.rollback()
+
+    async with SessionLocal() as session:
+        stored = (await session.execute(select(StoredFile).where(StoredFile.storage_key == key))).scalar_one()
+    assert stored.ref_count == 1
+    await release_stored_file(storage, key)
+    assert not (tmp_path / "objects" / key).exists()
+
+
+@pytest.mark.asyncio
+async def test_async_upload_is_processed_by_the_pipeline(client):
+    headers = {"Authorization": f"Bearer {await get_token(client, email='pipeline@test.com')}"}
+    response = await client.post(
+        "/api/v1/books?mode=async",
+        data={"title": "Queued Book", "author": "Author", "genre": "Drama", "year_published": "2022"},
+        files={"file": ("queued.txt", b"A queued book about patient lighthouse keepers.", "text/plain")},
+        headers=headers,
+    )
+    assert response.json()["status"] == 202
+    book = response.json()["data"]
+    assert book["processing_status"] == "queued"
+    assert book["summary"] is None
+
+    for _ in range(50):
+        await asyncio.sleep(0.1)
+        response = await client.get(f"/api/v1/books/{book['id']}/processing")
+        processing = response.json()["data"]
+        if processing["processing_status"] in {"ready", "failed"}:
+            break
+    assert processing["processing_status"] == "ready"
+    # The summary is built from the extracted pages inside the extract stage.
+    assert [(stage["stage"], stage["status"]) for stage in processing["stages"]] == [("extract", "completed")]
+    response = await client.get(f"/api/v1/books/{book['id']}")
+    assert response.json()["data"]["summary"].startswith("Summary (mock)")
@@ -1,6 +1,13 @@
 import asyncio
+import json
+
 import pytest
 
+from app.core.config import settings
+from app.services.ingestion import count_tokens
+from app.services.rag import pack_context
+from app.services.uploads import FORM_OVERHEAD_BYTES
+
 
 async def get_token(client, email="doc@test.com", password="Password123!"):
     await client.post("/api/v1/auth/signup", json={"email": email, "password": password, "role": "user"})
@@ -11,6 +18,20 @@ async def get_token(client, email="doc@test.com", password="Password123!"):
     return response.json()["data"]["access_token"]
 
 
+async def ingest(client, headers, doc_id, timeout=5.0):
+    # Starts ingestion and polls the job until it finishes, instead of sleeping a fixed time.
+    response = await client.post(f"/api/v1/ingestion/{doc_id}", headers=headers)
+    assert response.json()["status"] == 202
+    job = response.json()["data"]
+    deadline = asyncio.get_running_loop().time() + timeout
+    while job["status"] in ("pending", "running"):
+        assert asyncio.get_running_loop().time() < deadline, f"ingestion job {job['id']} did not finish"
+        await asyncio.sleep(0.05)
+        job = (await client.get(f"/api/v1/ingestion/jobs/{job['id']}", headers=headers)).json()["data"]
+    assert job["status"] == "completed"
+    return job
+
+
 @pytest.mark.asyncio
 async def test_document_ingestion_and_qa(client):
     token = await get_token(client)
@@ -23,10 +44,7 @@ async def test_document_ingestion_and_qa(client):
     )
     doc_id = response.json()["data"]["id"]
 
-    response = await client.post(f"/api/v1/ingestion/{doc_id}", headers=headers)
-    assert response.json()["status"] == 202
-
-    await asyncio.sleep(0.2)
+    await ingest(client, headers, doc_id)
 
     response = await client.post(
         "/api/v1/qa",
@@ -36,3 +54,193 @@ async def test_document_ingestion_and_qa(client):
 
     assert response.json()["status"] == 200
     assert response.json()["data"]["answer"]
+
+
+@pytest.mark.asyncio
+async def test_qa_is_scoped_to_owner_and_documents(client):
+    owner_headers = {"Authorization": f"Bearer {await get_token(client, email='scope-owner@test.com')}"}
+    other_headers = {"Authorization": f"Bearer {await get_token(client, email='scope-other@test.com')}"}
+
+    doc_ids = []
+    for filename, content in [
+        ("ships.txt", "Clipper ships carried tea across the ocean."),
+        ("trains.txt", "Steam trains crossed the continent by rail."),
+    ]:
+        response = await client.post(
+            "/api/v1/documents",
+            json={"filename": filename, "content": content},
+            headers=owner_headers,
+        )
+        doc_ids.append(response.json()["data"]["id"])
+        await ingest(client, owner_headers, doc_ids[-1])
+
+    response = await client.post(
+        "/api/v1/qa",
+        json={"question": "What carried tea?", "document_ids": [doc_ids[1]]},
+        headers=owner_headers,
+    )
+    assert response.json()["data"]["excerpts"] == ["Steam trains crossed the continent by rail."]
+
+    response = await client.post("/api/v1/qa", json={"question": "What carried tea?"}, headers=other_headers)
+    assert response.json()["status"] == 400
+
+
+@pytest.mark.asyncio
+async def test_batch_ingestion_reports_aggregate_progress(client):
+    headers = {"Authorization": f"Bearer {await get_token(client, email='batch@test.com')}"}
+    for i in range(3):
+        await client.post(
+            "/api/v1/documents",
+            json={"filename": f"batch-{i}.txt", "content": f"Batch document {i} mentions lighthouses."},
+            headers=headers,
+        )
+
+    response = await client.post("/api/v1/ingestion/batch", json={"all_uningested": True}, headers=headers)
+    assert response.json()["status"] == 202
+    batch = response.json()["data"]
+    assert batch["total_jobs"] == 3
+
+    for _ in range(50):
+        await asyncio.sleep(0.1)
+        response = await client.get(f"/api/v1/ingestion/batches/{batch['id']}", headers=headers)
+        batch = response.json()["data"]
+        if batch["status"] != "pending" and batch["status"] != "running":
+            break
+    assert batch["status"] == "completed"
+    assert batch["completed"] == 3
+    assert batch["chunks_processed"] >= 3
+
+    response = await client.post("/api/v1/ingestion/batch", json={"all_uningested": True}, headers=headers)
+    assert response.json()["status"] == 400
+
+
+@pytest.mark.asyncio
+async def test_document_upload_is_spooled_with_size_limit(client, monkeypatch):
+    headers = {"Authorization": f"Bearer {await get_token(client, email='upload@test.com')}"}
+    monkeypatch.setattr(settings, "upload_chunk_bytes", 4)
+    response = await client.post(
+        "/api/v1/documents/upload",
+        files={"file": ("notes.txt", "Spooled uploads keep memory flat.".encode(), "text/plain")},
+        headers=headers,
+    )
+    assert response.json()["status"] == 201
+    assert response.json()["data"]["content"] == "Spooled uploads keep memory flat."
+
+    monkeypatch.setattr(settings, "max_upload_bytes", 10)
+    response = await client.post(
+        "/api/v1/documents/upload",
+        files={"file": ("big.txt", b"x" * 64, "text/plain")},
+        headers=headers,
+    )
+    assert response.json()["status"] == 413
+
+
+@pytest.mark.asyncio
+async def test_oversized_upload_bodies_are_rejected_while_streaming(client, monkeypatch):
+    headers = {"Authorization": f"Bearer {await get_token(client, email='upload-stream@test.com')}"}
+    monkeypatch.setattr(settings, "max_upload_bytes", 10)
+    response = await client.post(
+        "/api/v1/documents/upload",
+        files={"file": ("huge.txt", b"x" * (FORM_OVERHEAD_BYTES + 1024), "text/plain")},
+        headers=headers,
+    )
+    assert response.json()["status"] == 413
+
+    sent = []
+
+    async def body():
+        yield b'--edge\r\nContent-Disposition: form-data; name="file"; filename="huge.txt"\r\n\r\n'
+        for _ in range(64):
+            sent.append(1)
+            yield b"x" * 4096
+
+    response = await client.post(
+        "/api/v1/documents/upload",
+        content=body(),
+        headers={**headers, "Content-Type": "multipart/form-data; boundary=edge"},
+    )
+    assert response.json()["status"] == 413
+    assert len(sent) < 64
+
+
+def parse_events(body: str) -> list[tuple[str, object]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields.get("event", "message"), json.loads(fields["data"])))
+    return events
+
+
+@pytest.mark.asyncio
+async def test_qa_and_summary_stream_server_sent_events(client):
+    headers = {"Authorization": f"Bearer {await get_token(client, email='stream@test.com')}"}
+    response = await client.post(
+        "/api/v1/documents",
+        json={"filename": "stream.txt", "content": "Clippers carried tea from China to London."},
+        headers=headers,
+    )
+    doc_id = response.json()["data"]["id"]
+    await ingest(client, headers, doc_id)
+
+    response = await client.post("/api/v1/qa/stream", json={"question": "What carried tea?"}, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_events(response.text)
+    assert events[0] == ("excerpts", ["Clippers carried tea from China to London."])
+    assert "Clippers" in "".join(data["token"] for name, data in events if name == "message")
+    assert events[-1] == ("done", {})
+
+    response = await client.post(
+        "/api/v1/generate-summary/stream", json={"content": "A short tale about tea clippers."}, headers=headers
+    )
+    events = parse_events(response.text)
+    tokens = [data["token"] for name, data in events if name == "message"]
+    assert len(tokens) > 1
+    assert "".join(tokens) == "Summary (mock): A short tale about tea clippers."
+    assert events[-1] == ("done", {})
+
+
+def test_pack_context_fits_chunks_to_the_token_budget():
+    question = "What carried tea?"
+    first = "Clipper ships carried tea. " * 4
+    second = "Steam trains crossed the continent by rail. They were fast. Coal powered them. " * 3
+    third = "Canal boats moved coal."
+
+    budget = count_tokens(question) + count_tokens(first) + 20
+    packed = pack_context(question, [first, first, second, third], budget_tokens=budget)
+    assert packed[0] == first
+    assert len(packed) == 2
+    assert second.startswith(packed[1]) and packed[1].endswith(".")
+    assert count_tokens(question) + sum(count_tokens(text) for text in packed) <= budget
+
+    assert pack_context(question, [first, second], budget_tokens=count_tokens(question) + 5) == []
+
+
+@pytest.mark.asyncio
+async def test_question_too_long_for_the_context_budget_is_rejected(client, monkeypatch):
+    headers = {"Authorization": f"Bearer {await get_token(client, email='long-question@test.com')}"}
+    response = await client.post(
+        "/api/v1/documents",
+        json={"filename": "tides.txt", "content": "Tides rise twice a day."},
+        headers=headers,
+    )
+    await ingest(client, headers, response.json()["data"]["id"])
+
+    monkeypatch.setattr(settings, "qa_context_tokens", 40)
+    response = await client.post("/api/v1/qa", json={"question": "Why do tides rise? " * 10}, headers=headers)
+    assert response.status_code == 400
+    assert response.json()["error_message"] == "Question is too long"
+
+
+@pytest.mark.asyncio
+async def test_qa_answers_through_the_configured_provider(client, recording_llm):
+    headers = {"Authorization": f"Bearer {await get_token(client, email='provider@test.com')}"}
+    content = "Clipper ships carried tea across the ocean."
+    response = await client.post("/api/v1/documents", json={"filename": "tea.txt", "content": content}, headers=headers)
+    await ingest(client, headers, response.json()["data"]["id"])
+
+    response = await client.post("/api/v1/qa", json={"question": "What carried tea?"}, headers=headers)
+    assert response.json()["data"] == {
+        "answer": f"Answer to What carried tea? from {len(content)} chars",
+        "excerpts": [content],
+    }
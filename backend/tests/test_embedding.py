@@ -1,4 +1,14 @@
-from app.services.embedding import cosine_similarity, embed_text
+import numpy as np
+import pytest
+
+from app.services.embedding import (
+    cosine_similarities,
+    cosine_similarity,
+    embed_text,
+    embed_texts,
+    pack_embedding,
+    unpack_embeddings,
+)
 
 
 def test_embed_text_returns_vector():
@@ -10,3 +20,27 @@ def test_cosine_similarity():
     a = embed_text("test")
     b = embed_text("test")
     assert cosine_similarity(a, b) > 0.9
+
+
+def test_embed_texts_matches_single_embedding():
+    texts = ["Hello world", "", "the quick brown fox jumps over the lazy dog"]
+    matrix = embed_texts(texts)
+    assert matrix.shape == (3, 128)
+    for row, text in zip(matrix, texts):
+        assert row.tolist() == pytest.approx(embed_text(text))
+    scores = cosine_similarities(matrix[0], matrix)
+    assert scores[0] == pytest.approx(1.0)
+    assert scores[1] == 0.0
+
+
+def test_pack_and_unpack_embeddings():
+    matrix = embed_texts(["alpha beta", "gamma"])
+    packed = [pack_embedding(row) for row in matrix]
+    assert len(packed[0]) == 128 * 4
+    assert np.array_equal(unpack_embeddings(packed), matrix)
+
+    half = pack_embedding(matrix[0], dtype="float16")
+    assert len(half) == 128 * 2
+    restored = unpack_embeddings([half, packed[1]])
+    assert restored.dtype == np.float32
+    assert np.allclose(restored[0], matrix[0], atol=1e-3)
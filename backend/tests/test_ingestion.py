@@ -0,0 +1,212 @@
+import re
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import and_, select
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.document import Document
+from app.models.document_chunk import DocumentChunk
+from app.models.ingestion_batch import IngestionBatch
+from app.models.ingestion_job import IngestionJob
+from app.services import ingestion
+from app.services.compute import shutdown_process_pool
+from app.services.ingestion import aiter_embedding_batches, build_embeddings, count_tokens, iter_chunks
+from app.services.ingestion_queue import IngestionScheduler, process_ingestion_job
+
+
+def test_chunks_respect_sentence_boundaries_and_token_budget():
+    text = " ".join(f"Sentence number {i} talks about topic {i}." for i in range(40))
+    chunks = list(iter_chunks(text, max_tokens=30, overlap_tokens=0))
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert count_tokens(chunk) <= 30
+        assert chunk.startswith("Sentence") and chunk.endswith(".")
+
+
+def test_chunks_overlap_and_paragraphs():
+    paragraphs = [" ".join(f"Point {i} is made here." for i in range(p, p + 3)) for p in range(0, 24, 3)]
+    chunks = list(iter_chunks("\n\n".join(paragraphs), max_tokens=20, overlap_tokens=6))
+    assert len(chunks) > 4
+    for previous, chunk in zip(chunks, chunks[1:]):
+        sentences = re.split(r"\s+(?=Point)", previous)
+        if len(sentences) > 1:
+            assert chunk.startswith(sentences[-1])
+    for chunk in chunks:
+        assert count_tokens(chunk) <= 20
+        for i in range(24):
+            # Paragraphs start at every third point and keep their blank line.
+            assert (f"\n\nPoint {i} " if i % 3 else f" Point {i} ") not in chunk
+
+
+def test_chunker_consumes_text_incrementally():
+    pieces = ["Alpha beta gam", "ma. Delta eps", "ilon.\n\nZeta."]
+    assert list(iter_chunks(iter(pieces), max_tokens=100)) == ["Alpha beta gamma. Delta epsilon.\n\nZeta."]
+    assert list(iter_chunks(["One.\n", "\nTwo."], max_tokens=100)) == ["One.\n\nTwo."]
+    assert list(iter_chunks(["Line one\r", "\nline two."], max_tokens=100)) == ["Line one\nline two."]
+    assert list(iter_chunks(["One.\r\n\r", "\nTwo."], max_tokens=100)) == ["One.\n\nTwo."]
+
+
+def test_long_sentence_is_split_on_words():
+    chunks = list(iter_chunks("word " * 50, max_tokens=20, overlap_tokens=0))
+    assert [count_tokens(chunk) for chunk in chunks] == [20, 20, 10]
+
+
+async def test_scheduler_reclaims_expired_leases():
+    async with SessionLocal() as session:
+        document = Document(filename="lease.txt", content="Lease test.", owner_id=1)
+        session.add(document)
+        await session.flush()
+        job = IngestionJob(
+            document_id=document.id,
+            status="running",
+            lease_owner="crashed-worker",
+            lease_expires_at=datetime.now(timezone.utc) - timedelta(minutes=5),
+        )
+        session.add(job)
+        await session.commit()
+
+    class ScopedScheduler(IngestionScheduler):
+        # Only this test's job, so pending jobs of other tests are not leased away.
+        def claim_filter(self, now):
+            return and_(IngestionJob.id == job.id, super().claim_filter(now))
+
+    scheduler = ScopedScheduler(workers=1, lease_seconds=60, poll_seconds=0.1, max_attempts=3)
+    assert await scheduler._claim() == job.id
+    assert await scheduler._claim() is None
+
+    async with SessionLocal() as session:
+        refreshed = await session.get(IngestionJob, job.id)
+        assert refreshed.lease_owner == scheduler.worker_id
+        assert refreshed.attempts == 1
+
+    await scheduler._execute(job.id)
+    async with SessionLocal() as session:
+        refreshed = await session.get(IngestionJob, job.id)
+        assert refreshed.status == "completed"
+        assert refreshed.lease_owner is None
+
+
+async def test_large_documents_are_embedded_in_the_process_pool(monkeypatch):
+    monkeypatch.setattr(settings, "cpu_offload_min_chars", 0)
+    # Small slices, so sentences and blank lines are cut across worker calls.
+    monkeypatch.setattr(ingestion, "OFFLOAD_SLICE_CHARS", 997)
+    text = "".join(f"Paragraph {i} describes part {i} of the system." + (" " if i % 3 else "\n\n") for i in range(400))
+
+    batches = [batch async for batch in aiter_embedding_batches(text, batch_size=16)]
+    try:
+        pooled = [(chunk, vector.tolist()) for batch in batches for chunk, vector in batch]
+        inline = [(chunk, vector.tolist()) for chunk, vector in build_embeddings(text)]
+        assert pooled == inline
+        assert len(batches) > 1
+    finally:
+        shutdown_process_pool()
+
+
+async def test_ingestion_inserts_in_batches_and_records_progress(monkeypatch):
+    monkeypatch.setattr(settings, "ingestion_batch_size", 2)
+    content = " ".join(f"Fact {i} is stored in its own chunk." for i in range(5))
+    async with SessionLocal() as session:
+        document = Document(filename="batches.txt", content=content, owner_id=1)
+        session.add(document)
+        await session.flush()
+        job = IngestionJob(document_id=document.id, status="running")
+        session.add(job)
+        await session.commit()
+
+    monkeypatch.setattr(settings, "chunk_max_tokens", 10)
+    monkeypatch.setattr(settings, "chunk_overlap_tokens", 0)
+    await process_ingestion_job(job.id)
+
+    async with SessionLocal() as session:
+        refreshed = await session.get(IngestionJob, job.id)
+        result = await session.execute(select(DocumentChunk.content).where(DocumentChunk.document_id == document.id))
+        contents = list(result.scalars().all())
+    assert refreshed.status == "completed"
+    assert refreshed.chunks_processed == len(contents) == 5
+
+
+async def test_incremental_reingestion_only_embeds_changed_chunks(monkeypatch):
+    monkeypatch.setattr(settings, "chunk_max_tokens", 10)
+    monkeypatch.setattr(settings, "chunk_overlap_tokens", 0)
+    sentences = [f"Fact {i} is stored in its own chunk." for i in range(4)]
+    async with SessionLocal() as session:
+        document = Document(filename="edit.txt", content=" ".join(sentences), owner_id=1)
+        session.add(document)
+        await session.flush()
+        first = IngestionJob(document_id=document.id, status="running")
+        session.add(first)
+        await session.commit()
+    await process_ingestion_job(first.id)
+
+    sentences[2] = "Fact 2 was edited after the first ingestion."
+    async with SessionLocal() as session:
+        stored = await session.get(Document, document.id)
+        stored.content = " ".join(sentences)
+        second = IngestionJob(document_id=document.id, status="running", mode="incremental")
+        session.add(second)
+        await session.commit()
+    await process_ingestion_job(second.id)
+
+    async with SessionLocal() as session:
+        refreshed = await session.get(IngestionJob, second.id)
+        result = await session.execute(select(DocumentChunk.content).where(DocumentChunk.document_id == document.id))
+        contents = sorted(result.scalars().all())
+    assert refreshed.status == "completed"
+    assert refreshed.chunks_processed == 1
+    assert contents == sorted(sentences)
+
+
+async def test_edit_mid_document_keeps_later_chunk_boundaries():
+    # Several sentences per chunk at the default budget: an inserted sentence must not shift every
+    # boundary after it.
+    sentences = [
+        f"Entry {i} of the keeper's log notes {'calm' if i % 3 else 'rough'} water and {i % 7 + 2} ships passing."
+        for i in range(240)
+    ]
+    async with SessionLocal() as session:
+        document = Document(filename="log.txt", content=" ".join(sentences), owner_id=1)
+        session.add(document)
+        await session.flush()
+        first = IngestionJob(document_id=document.id, status="running")
+        session.add(first)
+        await session.commit()
+    await process_ingestion_job(first.id)
+
+    sentences.insert(120, "A fog bank rolled in and the horn sounded until dawn.")
+    async with SessionLocal() as session:
+        stored = await session.get(Document, document.id)
+        stored.content = " ".join(sentences)
+        second = IngestionJob(document_id=document.id, status="running", mode="incremental")
+        session.add(second)
+        await session.commit()
+    await process_ingestion_job(second.id)
+
+    async with SessionLocal() as session:
+        refreshed = await session.get(IngestionJob, second.id)
+        result = await session.execute(select(DocumentChunk.id).where(DocumentChunk.document_id == document.id))
+        total = len(result.all())
+    assert refreshed.status == "completed"
+    assert total > 40
+    assert refreshed.chunks_processed <= 3
+
+
+async def test_scheduler_caps_parallel_jobs_per_batch():
+    async with SessionLocal() as session:
+        batch = IngestionBatch(owner_id=1, max_parallel=1, total_jobs=2)
+        session.add(batch)
+        await session.flush()
+        jobs = []
+        for i in range(2):
+            document = Document(filename=f"capped-{i}.txt", content="Capped batch.", owner_id=1)
+            session.add(document)
+            await session.flush()
+            jobs.append(IngestionJob(document_id=document.id, batch_id=batch.id, status="pending"))
+        session.add_all(jobs)
+        await session.commit()
+
+    scheduler = IngestionScheduler(workers=2, lease_seconds=60, poll_seconds=0.1, max_attempts=3)
+    claimed = set()
+    while (job_id := await scheduler._claim()) is not None:
+        claimed.add(job_id)
+    assert len(claimed & {job.id for job in jobs}) == 1
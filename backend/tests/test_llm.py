@@ -0,0 +1,250 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.services.http_client import get_http_client
+from app.services.llm import HttpLLM, OpenRouterLLM, get_llm_provider
+from app.services.llm_cache import LLMResponseCache, cache_key
+from app.services.llm_guard import CircuitBreaker, LLMGuard, TokenBucket
+from app.services.llm_scheduler import LLMDeadlineExceeded, LLMScheduler, LLMUnavailableError, LLMWork, llm_work
+
+
+@pytest.mark.asyncio
+async def test_llm_providers_are_singletons_sharing_one_client(monkeypatch, mock_http_client):
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.url.host)
+        return httpx.Response(200, json={"choices": [{"message": {"content": "pooled"}}]})
+
+    clients = await mock_http_client(handler)
+    monkeypatch.setattr(settings, "llm_cache_enabled", False)
+    monkeypatch.setattr(settings, "llm_base_url", "http://llm.test")
+    monkeypatch.setattr(settings, "openrouter_api_key", "key")
+
+    monkeypatch.setattr(settings, "llm_provider", "http")
+    first = await get_llm_provider()
+    assert isinstance(first, HttpLLM)
+    assert await get_llm_provider() is first
+    monkeypatch.setattr(settings, "llm_provider", "openrouter")
+    second = await get_llm_provider()
+    assert isinstance(second, OpenRouterLLM)
+
+    assert await first.summarize("book") == "pooled"
+    assert await second.summarize("book") == "pooled"
+    assert await first.analyze_reviews("reviews") == "pooled"
+    assert seen == ["llm.test", "openrouter.ai", "llm.test"]
+    assert len(clients) == 1 and get_http_client() is clients[0]
+
+
+@pytest.mark.asyncio
+async def test_llm_cache_serves_repeat_prompts_from_both_tiers():
+    cache = LLMResponseCache(ttl_seconds=60, memory_entries=2, max_rows=100)
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "cached answer"
+
+    key = cache_key("openrouter", "model-a", "system", "user prompt", {"temperature": 0.2})
+    assert key != cache_key("openrouter", "model-b", "system", "user prompt", {"temperature": 0.2})
+
+    results = await asyncio.gather(cache.get_or_compute(key, call), cache.get_or_compute(key, call))
+    assert results == ["cached answer", "cached answer"]
+    assert await cache.get_or_compute(key, call) == "cached answer"
+    cache.clear_memory()
+    assert await cache.get_or_compute(key, call) == "cached answer"
+
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert (stats["misses"], stats["memory_hits"], stats["persistent_hits"]) == (1, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_llm_cache_expires_and_evicts():
+    cache = LLMResponseCache(ttl_seconds=0, memory_entries=1, max_rows=100)
+    calls = []
+
+    async def call():
+        calls.append(1)
+        return "fresh"
+
+    await cache.get_or_compute("expiring-key", call)
+    await cache.get_or_compute("expiring-key", call)
+    assert len(calls) == 2
+
+    cache.ttl_seconds = 60
+    await cache.get_or_compute("lru-a", call)
+    await cache.get_or_compute("lru-b", call)
+    assert cache.stats()["memory_size"] == 1
+    assert cache.stats()["evictions"] >= 1
+
+
+def _status_error(code: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "http://llm.test/v1/chat/completions")
+    return httpx.HTTPStatusError("error", request=request, response=httpx.Response(code, request=request))
+
+
+@pytest.mark.asyncio
+async def test_llm_guard_retries_rate_limited_calls(monkeypatch):
+    monkeypatch.setattr(settings, "llm_retry_base_seconds", 0)
+    monkeypatch.setattr(settings, "llm_rate_per_second", 0)
+    guard = LLMGuard()
+    responses = [_status_error(429), _status_error(503), "answer"]
+
+    async def call():
+        result = responses.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    assert await guard.run("http:llm.test", call) == "answer"
+    stats = guard.stats()["providers"]["http:llm.test"]
+    assert (stats["calls"], stats["retries"], stats["rate_limited"], stats["circuit"]) == (1, 2, 1, "closed")
+
+
+@pytest.mark.asyncio
+async def test_llm_guard_sheds_background_work_first(monkeypatch):
+    monkeypatch.setattr(settings, "llm_max_retries", 0)
+    monkeypatch.setattr(settings, "llm_breaker_background_failures", 1)
+    monkeypatch.setattr(settings, "llm_breaker_failures", 2)
+    guard = LLMGuard()
+
+    async def failing():
+        raise _status_error(500)
+
+    async def ok():
+        return "ok"
+
+    with pytest.raises(Exception):
+        await guard.run("openrouter", failing)
+    with llm_work("background", "book:1"), pytest.raises(LLMUnavailableError):
+        await guard.run("openrouter", ok)
+    assert await guard.run("openrouter", ok) == "ok"
+    assert guard.stats()["providers"]["openrouter"]["circuit"] == "closed"
+
+    for _ in range(2):
+        with pytest.raises(Exception):
+            await guard.run("openrouter", failing)
+    with pytest.raises(LLMUnavailableError):
+        await guard.run("openrouter", ok)
+    stats = guard.stats()["providers"]["openrouter"]
+    assert (stats["circuit"], stats["shed_background"], stats["shed_interactive"]) == ("open", 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_throttles_past_burst():
+    bucket = TokenBucket(rate=50, capacity=2)
+    waits = [await bucket.acquire() for _ in range(3)]
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2] > 0
+
+
+@pytest.mark.asyncio
+async def test_llm_scheduler_prefers_interactive_and_rotates_users():
+    scheduler = LLMScheduler(slots=1)
+    await scheduler.acquire(LLMWork("background", "book:1"))
+    order = []
+
+    async def call(work: LLMWork, label: str):
+        await scheduler.acquire(work)
+        order.append(label)
+        scheduler.release()
+
+    waiters = [
+        asyncio.create_task(call(LLMWork("background", "book:2"), "background")),
+        asyncio.create_task(call(LLMWork("interactive", "alice"), "alice-1")),
+        asyncio.create_task(call(LLMWork("interactive", "alice"), "alice-2")),
+        asyncio.create_task(call(LLMWork("interactive", "bob"), "bob-1")),
+    ]
+    await asyncio.sleep(0)
+    scheduler.release()
+    await asyncio.gather(*waiters)
+    assert order == ["alice-1", "bob-1", "alice-2", "background"]
+    assert scheduler.active == 0
+
+
+@pytest.mark.asyncio
+async def test_llm_scheduler_drops_work_past_its_deadline(monkeypatch):
+    monkeypatch.setattr(settings, "llm_background_deadline_seconds", 0.05)
+    scheduler = LLMScheduler(slots=1)
+    await scheduler.acquire(LLMWork("interactive", "alice"))
+    with pytest.raises(LLMDeadlineExceeded):
+        await scheduler.acquire(LLMWork("background", "book:1"))
+    scheduler.release()
+    stats = scheduler.stats()
+    assert (stats["active"], stats["background"]["dropped"], stats["background"]["queued"]) == (0, 1, 0)
+
+
+@pytest.mark.asyncio
+async def test_http_llm_streams_openai_style_deltas(mock_http_client):
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert json.loads(request.content)["stream"] is True
+        chunks = [": keep-alive"] + [
+            f"data: {json.dumps({'choices': [{'delta': {'content': text}}]})}" for text in ("Tea ", "clippers")
+        ]
+        body = "\n\n".join(chunks + ["data: [DONE]"]) + "\n\n"
+        return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+    await mock_http_client(handler)
+    provider = HttpLLM("http://llm.test")
+    assert [chunk async for chunk in provider.stream_summarize("A book")] == ["Tea ", "clippers"]
+
+
+def test_circuit_breaker_recovers_without_tightening_on_interactive_calls(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=3, background_threshold=1, reset_seconds=10)
+
+    breaker.record_failure()
+    assert breaker.state == "shedding"
+    assert not breaker.allow(background=True)
+    now[0] += 10
+    # Past the cool-off a shedding breaker keeps serving interactive calls and lets one
+    # background probe through at a time.
+    assert breaker.state == "shedding"
+    assert breaker.allow(background=True)
+    assert not breaker.allow(background=True)
+    assert breaker.allow(background=False) and breaker.allow(background=False)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow(background=False)
+    now[0] += 10
+    assert breaker.state == "half_open"
+    assert not breaker.allow(background=True)
+    assert breaker.allow(background=False)
+    assert not breaker.allow(background=False)
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_llm_cache_waiters_survive_a_cancelled_leader():
+    cache = LLMResponseCache(ttl_seconds=60, memory_entries=8, max_rows=100)
+    started = asyncio.Event()
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        started.set()
+        await asyncio.sleep(10)
+        return "never"
+
+    async def fast():
+        calls.append(1)
+        return "recomputed"
+
+    leader = asyncio.create_task(cache.get_or_compute("cancelled-leader", slow))
+    await started.wait()
+    waiters = [asyncio.create_task(cache.get_or_compute("cancelled-leader", fast)) for _ in range(2)]
+    await asyncio.sleep(0)
+    leader.cancel()
+    assert await asyncio.gather(*waiters) == ["recomputed", "recomputed"]
+    assert leader.cancelled()
+    assert len(calls) == 2
@@ -0,0 +1,76 @@
+import json
+
+import numpy as np
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.db.base import Base
+from app.db.migrations import backfill_chunk_vectors, run_migrations
+from app.db.session import SessionLocal
+from app.models.document import Document
+from app.models.document_chunk import DocumentChunk
+from app.services.embedding import embed_text, unpack_embeddings
+
+
+async def test_backfill_packs_legacy_json_embeddings():
+    legacy = embed_text("legacy chunk text")
+    async with SessionLocal() as session:
+        document = Document(filename="legacy.txt", content="legacy chunk text", owner_id=1)
+        session.add(document)
+        await session.flush()
+        chunk = DocumentChunk(document_id=document.id, content="legacy chunk text", embedding=legacy)
+        session.add(chunk)
+        await session.commit()
+
+        assert await backfill_chunk_vectors(session, batch_size=1) >= 1
+
+        result = await session.execute(
+            select(DocumentChunk.vector, DocumentChunk.embedding).where(DocumentChunk.id == chunk.id)
+        )
+        vector, embedding = result.one()
+        assert embedding is None
+        assert np.allclose(unpack_embeddings([vector])[0], legacy)
+
+
+BASELINE_CHUNKS_DDL = """
+CREATE TABLE document_chunks (
+    id INTEGER NOT NULL,
+    document_id INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    embedding JSON NOT NULL,
+    created_at DATETIME DEFAULT (CURRENT_TIMESTAMP),
+    PRIMARY KEY (id),
+    FOREIGN KEY(document_id) REFERENCES documents (id) ON DELETE CASCADE
+)
+"""
+
+
+async def test_migrations_upgrade_a_baseline_sqlite_database(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'baseline.db'}")
+    legacy = embed_text("baseline chunk")
+    tables = [table for name, table in Base.metadata.tables.items() if name != "document_chunks"]
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda sync_conn: Base.metadata.create_all(sync_conn, tables=tables))
+        await conn.execute(text(BASELINE_CHUNKS_DDL))
+        await conn.execute(text("CREATE INDEX ix_document_chunks_document_id ON document_chunks (document_id)"))
+        await conn.execute(text("INSERT INTO users (id, email, hashed_password, role) VALUES (1, 'a@b.c', 'x', 'user')"))
+        await conn.execute(text("INSERT INTO documents (id, filename, content, owner_id) VALUES (1, 'a.txt', 'a', 1)"))
+        await conn.execute(
+            text("INSERT INTO document_chunks (document_id, content, embedding) VALUES (1, 'baseline chunk', :embedding)"),
+            {"embedding": json.dumps(list(legacy))},
+        )
+
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with session_factory() as session:
+        await run_migrations(engine, session)
+        vector, embedding, owner_id, content_hash = (
+            await session.execute(
+                select(DocumentChunk.vector, DocumentChunk.embedding, DocumentChunk.owner_id, DocumentChunk.content_hash)
+            )
+        ).one()
+        assert embedding is None and owner_id == 1 and content_hash
+        assert np.allclose(unpack_embeddings([vector])[0], legacy)
+
+        session.add(DocumentChunk(document_id=1, owner_id=1, content="new chunk", vector=vector))
+        await session.commit()
+    await engine.dispose()
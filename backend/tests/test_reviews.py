@@ -1,4 +1,15 @@
+import asyncio
+
 import pytest
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.book import Book
+from app.models.book_processing_job import BookProcessingJob
+from app.models.review import Review
+from app.services import book_pipeline
+from app.services.review_analysis import generate_review_summary
 
 
 async def get_token(client, email="reviewer@test.com", password="Password123!"):
@@ -41,3 +52,113 @@ async def test_add_review(client):
     response = await client.get(f"/api/v1/books/{book_id}/reviews")
     assert response.json()["status"] == 200
     assert len(response.json()["data"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_review_burst_regenerates_summary_once(client, monkeypatch):
+    monkeypatch.setattr(settings, "review_summary_debounce_seconds", 0.5)
+    headers = {"Authorization": f"Bearer {await get_token(client, email='burst@test.com')}"}
+    response = await client.post(
+        "/api/v1/books",
+        data={"title": "Burst Book", "author": "Author", "genre": "Drama", "year_published": "2022"},
+        files={"file": ("burst.txt", b"Burst content.", "text/plain")},
+        headers=headers,
+    )
+    book_id = response.json()["data"]["id"]
+    await client.post(f"/api/v1/books/{book_id}/borrow", headers=headers)
+
+    for text in ("Loved it", "Slow middle", "Great ending"):
+        response = await client.post(
+            f"/api/v1/books/{book_id}/reviews",
+            json={"review_text": text, "rating": 4},
+            headers=headers,
+        )
+        assert response.json()["status"] == 201
+
+    for _ in range(50):
+        await asyncio.sleep(0.1)
+        response = await client.get(f"/api/v1/books/{book_id}/processing")
+        stages = [(stage["stage"], stage["status"]) for stage in response.json()["data"]["stages"]]
+        if stages and stages[-1][1] in {"completed", "failed"}:
+            break
+    assert stages == [("summarize", "completed"), ("review_summary", "completed")]
+    assert response.json()["data"]["processing_status"] == "ready"
+
+    response = await client.get(f"/api/v1/books/{book_id}/summary")
+    review_summary = response.json()["data"]["review_summary"]
+    assert "Loved it" in review_summary and "Great ending" in review_summary
+
+
+@pytest.mark.asyncio
+async def test_full_review_summary_is_map_reduced(monkeypatch, recording_llm):
+    monkeypatch.setattr(settings, "review_summary_batch_tokens", 3)
+    monkeypatch.setattr(settings, "summary_reduce_fan_in", 2)
+    summary = await generate_review_summary(["one two", "three four", "five six", "seven eight"], recording_llm)
+    # Four map calls of one review each, then two reduce rounds.
+    assert len(recording_llm.calls) == 4 + 2 + 1
+    assert summary == "Consensus 7"
+
+
+@pytest.mark.asyncio
+async def test_review_summary_rolls_forward_from_watermark(client, monkeypatch, recording_llm):
+    monkeypatch.setattr(settings, "review_summary_debounce_seconds", 60)
+    headers = {"Authorization": f"Bearer {await get_token(client, email='rolling@test.com')}"}
+    response = await client.post(
+        "/api/v1/books",
+        data={"title": "Rolling Book", "author": "Author", "genre": "Drama", "year_published": "2022"},
+        files={"file": ("rolling.txt", b"Rolling content.", "text/plain")},
+        headers=headers,
+    )
+    book_id = response.json()["data"]["id"]
+    await client.post(f"/api/v1/books/{book_id}/borrow", headers=headers)
+
+    async def add_review_and_summarize(text: str) -> Book:
+        await client.post(f"/api/v1/books/{book_id}/reviews", json={"review_text": text, "rating": 3}, headers=headers)
+        async with SessionLocal() as session:
+            book = await session.get(Book, book_id)
+            result = await session.execute(
+                select(BookProcessingJob).where(
+                    BookProcessingJob.book_id == book_id, BookProcessingJob.stage == book_pipeline.REVIEW_STAGE
+                )
+            )
+            await book_pipeline._summarize_reviews(session, result.scalars().first(), book)
+            await session.commit()
+            return book
+
+    book = await add_review_and_summarize("Opening review")
+    assert recording_llm.calls == ["Opening review"]
+    assert book.review_summary_rolled == 0
+
+    book = await add_review_and_summarize("Second review")
+    assert recording_llm.calls[-1] == "Current consensus:\nConsensus 1\n\nNew reviews:\nSecond review"
+    assert book.review_summary == "Consensus 2"
+    assert book.review_summary_rolled == 1
+
+    monkeypatch.setattr(settings, "review_summary_compact_after", 1)
+    await add_review_and_summarize("Third review")
+    assert recording_llm.calls[-1] == "Opening review\nSecond review\nThird review"
+
+
+@pytest.mark.asyncio
+async def test_review_committed_below_the_watermark_is_still_summarized(recording_llm):
+    async with SessionLocal() as session:
+        book = Book(title="Late Review Book", author="Author", genre="Drama", year_published=2022)
+        session.add(book)
+        await session.flush()
+        late = Review(book_id=book.id, user_id=1, review_text="Late review", rating=4)
+        early = Review(book_id=book.id, user_id=1, review_text="Early review", rating=5, summarized=True)
+        session.add(late)
+        await session.flush()
+        session.add(early)
+        await session.flush()
+        # `early` has the higher id but was summarized before `late` committed.
+        book.review_summary, book.review_summary_watermark = "Consensus 0", early.id
+        job = BookProcessingJob(book_id=book.id, stage=book_pipeline.REVIEW_STAGE, status="running")
+        session.add(job)
+        await session.commit()
+
+        await book_pipeline._summarize_reviews(session, job, book)
+        await session.commit()
+        assert recording_llm.calls == ["Current consensus:\nConsensus 0\n\nNew reviews:\nLate review"]
+        assert (await session.get(Review, late.id)).summarized
+        assert book.review_summary_watermark == early.id
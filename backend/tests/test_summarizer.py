@@ -1,7 +1,14 @@
+import asyncio
+import json
+
+import httpx
 import pytest
 
-from app.services.summarizer import generate_summary
 from app.api.deps import get_llm
+from app.core.config import settings
+from app.services.llm import HttpLLM
+from app.services.summarizer import generate_summary
+
 
 @pytest.mark.asyncio
 async def test_generate_summary_fallback():
@@ -10,3 +17,53 @@ async def test_generate_summary_fallback():
     summary = await generate_summary(text, llm)
     assert summary
     assert len(summary) <= 500
+
+
+@pytest.mark.asyncio
+async def test_long_text_is_map_reduced_through_the_response_cache(monkeypatch, mock_http_client):
+    calls = []
+    active = peak = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal active, peak
+        prompt = json.loads(request.content)["messages"][-1]["content"]
+        calls.append(prompt)
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return httpx.Response(200, json={"choices": [{"message": {"content": f"Summary {hash(prompt)}"}}]})
+
+    await mock_http_client(handler)
+    monkeypatch.setattr(settings, "llm_rate_per_second", 0)
+    monkeypatch.setattr(settings, "summary_section_tokens", 60)
+    monkeypatch.setattr(settings, "summary_concurrency", 2)
+    monkeypatch.setattr(settings, "summary_reduce_fan_in", 3)
+    paragraphs = [f"Chapter {i} follows the keeper through storm number {i}." for i in range(40)]
+
+    llm = HttpLLM("http://summary.test")
+    first = await generate_summary("\n\n".join(paragraphs), llm)
+    assert first
+    assert peak == 2
+    # 13 sections, then reduce rounds of 5, 2 and 1 groups.
+    assert len(calls) == 13 + 5 + 2 + 1
+
+    paragraphs[3] += " The lamp went dark for an hour."
+    calls.clear()
+    await generate_summary("\n\n".join(paragraphs), llm)
+    # Sections hold several paragraphs; only the edited one and the reduce steps above it are resent.
+    assert len(calls) == 1 + 3
+    assert "The lamp went dark" in calls[0]
+
+
+@pytest.mark.asyncio
+async def test_summary_can_be_fed_from_streamed_pages(monkeypatch):
+    monkeypatch.setattr(settings, "summary_section_tokens", 12)
+    text = "\n".join(f"Page {i} describes the lamp room on night {i}." for i in range(6))
+
+    async def pages():
+        for start in range(0, len(text), 17):
+            yield text[start : start + 17]
+
+    llm = await get_llm()
+    assert await generate_summary(pages(), llm) == await generate_summary(text, llm)
@@ -0,0 +1,40 @@
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from app.core.config import settings
+from app.services.compute import shutdown_process_pool
+from app.services.text_extraction import extract_file_text_async, iter_pdf_pages
+
+
+def write_pdf(path, pages):
+    writer = PdfWriter()
+    font = DictionaryObject(
+        {
+            NameObject("/Type"): NameObject("/Font"),
+            NameObject("/Subtype"): NameObject("/Type1"),
+            NameObject("/BaseFont"): NameObject("/Helvetica"),
+        }
+    )
+    for text in pages:
+        page = writer.add_blank_page(width=300, height=200)
+        page[NameObject("/Resources")] = DictionaryObject(
+            {NameObject("/Font"): DictionaryObject({NameObject("/F1"): writer._add_object(font)})}
+        )
+        stream = DecodedStreamObject()
+        stream.set_data(f"BT /F1 12 Tf 20 100 Td ({text}) Tj ET".encode())
+        page[NameObject("/Contents")] = writer._add_object(stream)
+    with open(path, "wb") as handle:
+        writer.write(handle)
+
+
+async def test_pdf_pages_stream_in_order_across_ranges(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "pdf_pages_per_task", 2)
+    path = tmp_path / "book.pdf"
+    write_pdf(path, [f"Page {i} text" for i in range(7)])
+    try:
+        pages = [page async for page in iter_pdf_pages(path)]
+        text, content_type = await extract_file_text_async("book.pdf", path)
+    finally:
+        shutdown_process_pool()
+    assert [page.strip() for page in pages] == [f"Page {i} text" for i in range(7)]
+    assert (text, content_type) == ("\n".join(pages), "application/pdf")
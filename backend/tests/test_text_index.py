@@ -0,0 +1,66 @@
+from app.db.session import SessionLocal
+from app.models.document import Document
+from app.models.document_chunk import DocumentChunk
+from app.services.rag import fuse_rankings
+from app.services.text_index import InvertedIndex
+
+
+def test_bm25_ranks_exact_term_hits_first():
+    index = InvertedIndex()
+    index.add(
+        [1, 2, 3],
+        [
+            "The borrow policy allows two books per member.",
+            "Kubernetes operators reconcile desired state.",
+            "Members may renew a borrow once.",
+        ],
+    )
+    assert index.document_frequency("borrow") == 2
+
+    hits = index.search("kubernetes operators")
+    assert hits[0][0] == 2
+    assert {chunk_id for chunk_id, _ in index.search("borrow")} == {1, 3}
+    assert index.search("unknownterm") == []
+
+
+def test_inverted_index_skips_already_indexed_chunks():
+    index = InvertedIndex()
+    index.add([1], ["alpha beta"])
+    index.add([1, 2], ["alpha beta", "gamma"])
+    assert len(index) == 2
+    assert index.document_frequency("alpha") == 1
+
+
+def test_fuse_rankings_rewards_agreement():
+    assert fuse_rankings([[1, 2, 3], [2, 4]])[:2] == [2, 1]
+
+
+async def test_inverted_index_sync_picks_up_rows_committed_out_of_id_order():
+    async with SessionLocal() as session:
+        document = Document(filename="late-text.txt", content="Late commits.", owner_id=9002)
+        session.add(document)
+        await session.flush()
+        chunks = [
+            DocumentChunk(document_id=document.id, owner_id=9002, content=text)
+            for text in ("lighthouse keepers", "lighthouse lenses")
+        ]
+        session.add_all(chunks)
+        await session.commit()
+
+        index = InvertedIndex(owner_id=9002)
+        await index.sync(session)
+        # The lower id stands for a row a concurrent writer committed after the higher one was synced.
+        index.remove([chunks[0].id], [chunks[0].content])
+        assert len(index) == 1
+        await index.sync(session)
+        assert len(index) == 2
+        assert {chunk_id for chunk_id, _ in index.search("lighthouse")} == {chunk.id for chunk in chunks}
+
+
+def test_inverted_index_discards_chunks_without_their_text():
+    index = InvertedIndex()
+    index.add([1, 2, 3], ["alpha beta", "alpha gamma", ""])
+    index.discard([2, 3, 99])
+    assert len(index) == 1
+    assert index.document_frequency("alpha") == 1 and index.document_frequency("gamma") == 0
+    assert [chunk_id for chunk_id, _ in index.search("alpha")] == [1]
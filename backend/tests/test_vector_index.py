@@ -0,0 +1,121 @@
+from sqlalchemy import delete
+
+from app.db.session import SessionLocal
+from app.models.document import Document
+from app.models.document_chunk import DocumentChunk
+from app.services import text_index, vector_index
+from app.services.embedding import embed_text, embed_texts, pack_embedding
+from app.services.text_index import InvertedIndex
+from app.services.vector_index import QuantizedVectorIndex, VectorIndex, measure_recall
+
+
+def test_vector_index_returns_top_matches():
+    index = VectorIndex()
+    texts = ["FastAPI web framework", "Baking sourdough bread", "Python async web server"]
+    index.add([1, 2, 3], [embed_text(text) for text in texts])
+
+    hits = index.search(embed_text("FastAPI web framework"), limit=2)
+    assert [chunk_id for chunk_id, _ in hits][0] == 1
+    assert len(hits) == 2
+    assert hits[0][1] >= hits[1][1]
+
+
+def test_vector_index_skips_duplicate_ids():
+    index = VectorIndex()
+    index.add([5], [embed_text("hello")])
+    index.add([5, 6], [embed_text("hello"), embed_text("world")])
+    assert len(index) == 2
+    assert index.last_id == 6
+
+
+def test_quantized_index_recall_against_exact_search():
+    texts = [f"chapter {i} covers topic {i % 17} and section {i % 5} in depth" for i in range(300)]
+    vectors = embed_texts(texts)
+    queries = embed_texts([f"topic {i} section {i % 5}" for i in range(20)])
+    assert measure_recall(vectors, queries, limit=4, rerank_factor=8) >= 0.9
+
+    index = QuantizedVectorIndex(rerank_factor=8)
+    index.add(list(range(1, 301)), vectors)
+    shortlist = [chunk_id for chunk_id, _ in index.search(vectors[42], limit=32)]
+    assert 43 in shortlist
+
+
+async def test_vector_index_sync_picks_up_rows_committed_out_of_id_order():
+    async with SessionLocal() as session:
+        document = Document(filename="late.txt", content="Late commits.", owner_id=9001)
+        session.add(document)
+        await session.flush()
+        chunks = [
+            DocumentChunk(document_id=document.id, owner_id=9001, content=text, vector=pack_embedding(embed_text(text)))
+            for text in ("committed late", "committed first")
+        ]
+        session.add_all(chunks)
+        await session.commit()
+
+        index = VectorIndex(owner_id=9001)
+        await index.sync(session)
+        assert len(index) == 2
+        # The lower id stands for a row a concurrent writer committed after the higher one was synced.
+        index.remove([chunks[0].id])
+        await index.sync(session)
+        assert {chunk_id for chunk_id, _ in index.search(embed_text("committed late"), limit=2)} == {
+            chunk.id for chunk in chunks
+        }
+
+
+async def test_index_reconcile_drops_chunks_deleted_by_another_process():
+    async with SessionLocal() as session:
+        document = Document(filename="gone.txt", content="Deleted elsewhere.", owner_id=9003)
+        session.add(document)
+        await session.flush()
+        chunks = [
+            DocumentChunk(document_id=document.id, owner_id=9003, content=text, vector=pack_embedding(embed_text(text)))
+            for text in ("kept harbour", "deleted harbour")
+        ]
+        session.add_all(chunks)
+        await session.commit()
+
+        index, keyword_index = VectorIndex(owner_id=9003), InvertedIndex(owner_id=9003)
+        await index.sync(session)
+        await keyword_index.sync(session)
+        await session.execute(delete(DocumentChunk).where(DocumentChunk.id == chunks[1].id))
+        await session.commit()
+
+        index._reconcile_at = keyword_index._reconcile_at = 0.0
+        await index.sync(session)
+        await keyword_index.sync(session)
+    assert [chunk_id for chunk_id, _ in index.search(embed_text("harbour"), limit=2)] == [chunks[0].id]
+    assert [chunk_id for chunk_id, _ in keyword_index.search("harbour")] == [chunks[0].id]
+
+
+async def test_startup_load_streams_chunks_grouped_by_owner(monkeypatch):
+    monkeypatch.setattr(vector_index, "SYNC_FETCH_ROWS", 2)
+    monkeypatch.setattr(text_index, "SYNC_FETCH_ROWS", 2)
+    monkeypatch.setattr(vector_index, "_chunk_indexes", {})
+    monkeypatch.setattr(text_index, "_chunk_text_indexes", {})
+    async with SessionLocal() as session:
+        ids: dict[int, set[int]] = {}
+        for owner_id in (9005, 9006):
+            document = Document(filename="load.txt", content="Loaded at startup.", owner_id=owner_id)
+            session.add(document)
+            await session.flush()
+            chunks = [
+                DocumentChunk(
+                    document_id=document.id,
+                    owner_id=owner_id,
+                    content=f"lighthouse log {i}",
+                    vector=pack_embedding(embed_text(f"lighthouse log {i}")),
+                )
+                for i in range(3)
+            ]
+            session.add_all(chunks)
+            await session.flush()
+            ids[owner_id] = {chunk.id for chunk in chunks}
+        await session.commit()
+
+        await vector_index.load_chunk_indexes(session)
+        await text_index.load_chunk_text_indexes(session)
+    for owner_id, chunk_ids in ids.items():
+        hits = vector_index.get_chunk_index(owner_id).search(embed_text("lighthouse log"), limit=10)
+        assert {chunk_id for chunk_id, _ in hits} == chunk_ids
+        assert {chunk_id for chunk_id, _ in text_index.get_chunk_text_index(owner_id).search("lighthouse")} == chunk_ids
@@ -1,6 +1,9 @@
 from __future__ import annotations
 
+import json
+
 from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 app = FastAPI(title="LLM Mock")
@@ -16,13 +19,26 @@ class ChatRequest(BaseModel):
     messages: list[ChatMessage]
     temperature: float | None = None
     max_tokens: int | None = None
+    stream: bool = False
+
+
+def stream_completion(content: str):
+    words = content.split(" ")
+    for index, word in enumerate(words):
+        delta = word if index == 0 else f" {word}"
+        chunk = {"choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}]}
+        yield f"data: {json.dumps(chunk)}\n\n"
+    yield f"data: {json.dumps({'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]})}\n\n"
+    yield "data: [DONE]\n\n"
 
 
 @app.post("/v1/chat/completions")
-async def chat_completions(payload: ChatRequest) -> dict:
+async def chat_completions(payload: ChatRequest):
     user_message = next((m.content for m in payload.messages if m.role == "user"), "")
     system_message = next((m.content for m in payload.messages if m.role == "system"), "")
     content = f"Mock response. System: {system_message[:120]} User: {user_message[:220]}"
+    if payload.stream:
+        return StreamingResponse(stream_completion(content), media_type="text/event-stream")
     return {
         "choices": [
             {
@@ -39,3 +39,25 @@ def test_chat_completions_returns_mock_response():
     assert "Mock response." in message["content"]
     assert "System:" in message["content"]
     assert "User:" in message["content"]
+
+
+def test_chat_completions_streams_deltas():
+    import json
+
+    app = load_llm_mock_app()
+    client = TestClient(app)
+    payload = {
+        "model": "mock",
+        "messages": [{"role": "user", "content": "Hello there!"}],
+        "stream": True,
+    }
+
+    response = client.post("/v1/chat/completions", json=payload)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = [line[len("data: ") :] for line in response.text.splitlines() if line.startswith("data: ")]
+    assert events[-1] == "[DONE]"
+    content = "".join(json.loads(event)["choices"][0]["delta"].get("content", "") for event in events[:-1])
+    assert content.startswith("Mock response.")
+    assert "Hello there!" in content